@@ -0,0 +1,291 @@
+"""
+Reproducible benchmark of ingestion and retrieval.
+
+Generates a synthetic knowledge base in every loader format and measures
+- load_allFiles: files/sec and entries/sec
+- chunking of the Markdown/TXT files: MB/sec and chunks/sec
+- FAQEngine.setup_collection: docs/sec
+- FAQEngine.answer_question: p50/p95/p99 latency at the given concurrency
+and writes everything as JSON, so two runs (before/after a change) can be compared.
+
+By default it runs offline: a deterministic stub embedder replaces the HuggingFace model and Qdrant
+runs in local in-memory mode. Use --embedder hf and/or --qdrant-url http://localhost:6333 for the real thing.
+
+    python benchmark.py --files 60 --entries 50 --queries 500 --concurrency 8 --output bench.json
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import yaml
+
+from loader import load_allFiles, stream_chunks
+from lexical_index import tokenize
+
+FORMATS = ("json", "yaml", "csv", "md", "txt")
+
+TOPICS = [
+    "list", "tuple", "dict", "set", "generator", "decorator", "context manager", "class", "inheritance",
+    "exception", "lambda", "comprehension", "iterator", "module", "package", "string", "f-string",
+    "slicing", "enumerate", "zip", "closure", "coroutine", "asyncio", "typing", "dataclass", "property",
+    "__slots__", "yield", "with statement", "import", "virtualenv", "pip", "unittest", "logging",
+]
+VERBS = ["use", "define", "iterate over", "copy", "sort", "test", "debug", "speed up", "document", "combine"]
+FILLER = [
+    "This is a common question for beginners.", "The standard library has helpers for this.",
+    "Performance depends on the size of the data.", "Prefer the simplest solution that works.",
+    "See the official documentation for the details.", "It behaves differently in older versions.",
+]
+
+
+class StubEmbedding:
+    """
+    Deterministic stand-in for the embedding model: every token gets a fixed random unit vector
+    (seeded by its md5), a text is the normalized sum of its tokens. Texts sharing words get similar
+    vectors, so retrieval returns sensible hits, and the results are the same on every machine.
+    """
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self._token_vectors: Dict[str, np.ndarray] = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            seed = int(hashlib.md5(token.encode("utf-8")).hexdigest()[:8], 16)
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            vector /= np.linalg.norm(vector)
+            self._token_vectors[token] = vector
+        return vector
+
+    def get_text_embedding(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text, keep_stopwords=True):
+            vector += self._token_vector(token)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def get_text_embedding_batch(self, texts: List[str], show_progress_bar: bool = False) -> List[List[float]]:
+        return [self.get_text_embedding(text) for text in texts]
+
+    def get_query_embedding(self, query: str) -> List[float]:
+        return self.get_text_embedding(query)
+
+
+def make_knowledge_base(directory: Path, files: int, entries: int, seed: int) -> Dict[str, Any]:
+    """Writes `files` files (spread over all formats) with about `entries` entries each. Returns sizes."""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    def qa(file_index: int, entry_index: int):
+        topic, verb = rng.choice(TOPICS), rng.choice(VERBS)
+        question = f"How do you {verb} a {topic} in Python (case {file_index}.{entry_index})?"
+        answer = f"To {verb} a {topic}, " + " ".join(rng.choice(FILLER) for _ in range(rng.randint(2, 6)))
+        return topic, question, answer
+
+    total_bytes = 0
+    for file_index in range(files):
+        fmt = FORMATS[file_index % len(FORMATS)]
+        path = directory / f"synthetic_{file_index:05d}.{fmt}"
+        items = [qa(file_index, entry_index) for entry_index in range(entries)]
+        if fmt == "json":
+            path.write_text(json.dumps([{"question": q, "answer": a} for _, q, a in items], indent=2), encoding="utf-8")
+        elif fmt == "yaml":
+            path.write_text(yaml.safe_dump([{"question": q, "answer": a} for _, q, a in items], sort_keys=False), encoding="utf-8")
+        elif fmt == "csv":
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["topic", "example", "description"])
+                for topic, q, a in items:
+                    writer.writerow([topic, q, a])
+        elif fmt == "md":
+            path.write_text("".join(f"## {q}\n\n{a}\n\n" for _, q, a in items), encoding="utf-8")
+        else:
+            path.write_text("".join(f"{q} {a}\n\n" for _, q, a in items), encoding="utf-8")
+        total_bytes += path.stat().st_size
+    return {"files": files, "entries_per_file": entries, "bytes": total_bytes}
+
+
+def make_queries(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed + 1)
+    return [f"how to {rng.choice(VERBS)} a {rng.choice(TOPICS)}" for _ in range(count)]
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    values = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+        "max_ms": float(values.max()),
+    }
+
+
+def bench_load(kb_dir: Path, workers: int) -> Dict[str, Any]:
+    # No all_entries.json dump, that is file writing and not loading
+    start = time.perf_counter()
+    entries = load_allFiles(str(kb_dir), workers=workers, dump_path=None)
+    elapsed = time.perf_counter() - start
+    files = sum(1 for path in kb_dir.iterdir() if path.is_file())
+    return {
+        "workers": workers,
+        "seconds": elapsed,
+        "files": files,
+        "entries": len(entries),
+        "files_per_second": files / elapsed,
+        "entries_per_second": len(entries) / elapsed,
+    }, entries
+
+
+def bench_chunking(kb_dir: Path) -> Dict[str, Any]:
+    paths = sorted(path for path in kb_dir.iterdir() if path.suffix in (".md", ".txt"))
+    size = sum(path.stat().st_size for path in paths)
+    start = time.perf_counter()
+    chunks = sum(1 for path in paths for _ in stream_chunks(path, max_chars=500))
+    elapsed = time.perf_counter() - start
+    return {
+        "files": len(paths),
+        "bytes": size,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "mb_per_second": size / 1e6 / elapsed if elapsed else 0.0,
+        "chunks_per_second": chunks / elapsed if elapsed else 0.0,
+    }
+
+
+def make_engine(args, work_dir: Path):
+    from newRag import FAQEngine
+
+    embed_model = StubEmbedding(args.dim) if args.embedder == "stub" else None
+    return FAQEngine(
+        qdrant_url=args.qdrant_url,
+        collection_name=args.collection,
+        vector_backend=args.backend,
+        vector_store_path=str(work_dir / "vector_store"),
+        embedding_cache_dir=None,  # measure the embedder, not the cache
+        query_cache_size=0,  # every query goes through embedding and search
+        semantic_cache_size=args.semantic_cache_size,  # off by default for the same reason, and to compare with older runs
+        lexical_index_dir=str(work_dir / "lexical_index"),
+        retrieval_mode=args.mode,
+        embed_model=embed_model,
+    )
+
+
+def bench_ingest(engine, entries: List[Dict], args) -> Dict[str, Any]:
+    start = time.perf_counter()
+    stats = engine.setup_collection(entries, batch_size=args.batch_size, pipelined=args.pipelined,
+                                    dedupe=None if args.dedupe == "off" else args.dedupe)
+    elapsed = time.perf_counter() - start
+    return {
+        "docs": len(entries),
+        "seconds": elapsed,
+        "docs_per_second": len(entries) / elapsed,
+        "batch_size": args.batch_size,
+        "pipelined": args.pipelined,
+        "stages": stats.get("stages"),
+        "duplicates": stats.get("duplicates", 0),
+    }
+
+
+def bench_queries(engine, queries: List[str], concurrency: int, top_k: int) -> Dict[str, Any]:
+    def timed(query: str) -> float:
+        start = time.perf_counter()
+        engine.answer_question(query, top_k=top_k, score_threshold=0.0)
+        return time.perf_counter() - start
+
+    # warm up (first search builds lazy structures)
+    for query in queries[:min(10, len(queries))]:
+        engine.answer_question(query, top_k=top_k, score_threshold=0.0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, queries))
+    elapsed = time.perf_counter() - start
+    return {
+        "queries": len(queries),
+        "concurrency": concurrency,
+        "top_k": top_k,
+        "seconds": elapsed,
+        "queries_per_second": len(queries) / elapsed,
+        **percentiles(latencies),
+        # Hits skip the vector search, so latencies with and without the cache don't compare
+        "semantic_cache": engine.semantic_cache.stats() if engine.semantic_cache is not None else None,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        return ""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark loading, chunking, ingestion and retrieval.")
+    parser.add_argument("--files", type=int, default=50, help="number of synthetic knowledge base files")
+    parser.add_argument("--entries", type=int, default=40, help="entries per file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0, help="load_allFiles worker processes")
+    parser.add_argument("--embedder", choices=("stub", "hf"), default="stub")
+    parser.add_argument("--dim", type=int, default=256, help="vector dimension of the stub embedder")
+    parser.add_argument("--backend", choices=("qdrant", "numpy"), default="qdrant")
+    parser.add_argument("--qdrant-url", default=":memory:", help='":memory:", a local folder or a server URL')
+    parser.add_argument("--collection", default="benchmark_collection")
+    parser.add_argument("--mode", choices=("dense", "hybrid", "lexical"), default="dense")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--pipelined", action="store_true")
+    parser.add_argument("--dedupe", choices=("off", "drop", "merge"), default="off")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--semantic-cache-size", type=int, default=0, help="semantic answer cache entries, 0 disables it")
+    parser.add_argument("--output", default="benchmark_results.json")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        kb_dir = work_dir / "knowledgebase"
+        results["knowledge_base"] = make_knowledge_base(kb_dir, args.files, args.entries, args.seed)
+        results["load"], entries = bench_load(kb_dir, args.workers)
+        results["chunking"] = bench_chunking(kb_dir)
+
+        engine = make_engine(args, work_dir)
+        results["ingest"] = bench_ingest(engine, entries, args)
+        results["query"] = bench_queries(engine, make_queries(args.queries, args.seed), args.concurrency, args.top_k)
+        engine.vector_store.close()
+
+    Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\nload      {results['load']['files_per_second']:10.1f} files/s  {results['load']['entries_per_second']:10.1f} entries/s")
+    print(f"chunking  {results['chunking']['mb_per_second']:10.1f} MB/s     {results['chunking']['chunks_per_second']:10.1f} chunks/s")
+    print(f"ingest    {results['ingest']['docs_per_second']:10.1f} docs/s")
+    query = results["query"]
+    print(f"query     {query['queries_per_second']:10.1f} q/s  p50 {query['p50_ms']:.2f} ms  p95 {query['p95_ms']:.2f} ms  p99 {query['p99_ms']:.2f} ms  (concurrency {query['concurrency']})")
+    semantic = query["semantic_cache"]
+    if semantic is None:
+        print("semantic cache off")
+    else:
+        print(f"semantic cache {args.semantic_cache_size} entries, hit rate {semantic['hit_rate']:.1%} (hits skip the vector search)")
+    print(f"Results written to {args.output}")
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class LRUCache:
+    """
+    A small thread-safe LRU cache with an optional time-to-live.
+    Keeps hit/miss counters so we can see if the cache is worth it.
+    """
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl  # seconds, None means entries never expire
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, count_miss: bool = True) -> Optional[Any]:
+        # count_miss=False for a fast-path check whose miss is counted again by the lookup that follows
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, stored_at = item
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SemanticCache:
+    """
+    Results of recently answered queries, found by query vector instead of query text, so that a
+    paraphrase ("what's a decorator in python" / "explain python decorators") reuses the result of
+    the first query without searching the vector store again.
+    A lookup is one matmul over the (at most max_size) cached query vectors; the best entry with the
+    same params (top_k, threshold, ...) counts if its cosine similarity is at least `threshold`.
+    Vectors must be normalized. When full, the least recently used entry is replaced; entries older
+    than ttl seconds don't match any more. Also counts hits, misses and the time spent in lookups.
+    """
+    def __init__(self, max_size: int = 256, threshold: float = 0.95, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # allocated on the first put, (max_size, dim)
+        self._params: List[Hashable] = []
+        self._values: List[Any] = []
+        self._stored_at: List[float] = []
+        self._last_used: List[int] = []
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    def get(self, vector: List[float], params: Hashable = None) -> Optional[Any]:
+        start = time.perf_counter()
+        with self._lock:
+            value = None
+            if self._values:
+                scores = self._vectors[:len(self._values)] @ np.asarray(vector, dtype=np.float32)
+                now = time.monotonic()
+                for slot in np.argsort(-scores):
+                    if scores[slot] < self.threshold:
+                        break
+                    if self._params[slot] == params and (self.ttl is None or now - self._stored_at[slot] < self.ttl):
+                        self._clock += 1
+                        self._last_used[slot] = self._clock
+                        value = self._values[slot]
+                        break
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self.lookup_seconds += time.perf_counter() - start
+            return value
+
+    def put(self, vector: List[float], params: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                self._vectors = np.zeros((self.max_size, len(vector)), dtype=np.float32)
+                self._params, self._values, self._stored_at, self._last_used = [], [], [], []
+            self._clock += 1
+            if len(self._values) < self.max_size:
+                slot = len(self._values)
+                self._params.append(params)
+                self._values.append(value)
+                self._stored_at.append(time.monotonic())
+                self._last_used.append(self._clock)
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._params[slot], self._values[slot] = params, value
+                self._stored_at[slot], self._last_used[slot] = time.monotonic(), self._clock
+            self._vectors[slot] = vector
+
+    def clear(self):
+        with self._lock:
+            self._params, self._values, self._stored_at, self._last_used = [], [], [], []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._values),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "threshold": self.threshold,
+            "mean_lookup_ms": 1000 * self.lookup_seconds / total if total else 0.0,
+        }
+
+
+def normalize_query(query: str) -> str:
+    """Collapses whitespace the same way normalize() does for the stored content"""
+    return " ".join(query.split())
@@ -0,0 +1,112 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+# Rough stand-in for a WordPiece tokenizer: words and punctuation marks
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def padding_stats(lengths: List[int], batches: List[List[int]]) -> Dict[str, Any]:
+    """
+    Real vs padded tokens of a batch plan. Every text of a batch is padded to the longest one,
+    so a batch costs len(batch) * max length; padding_ratio is the share of that spent on padding.
+    """
+    real = sum(lengths[i] for batch in batches for i in batch)
+    padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches if batch)
+    return {
+        "batches": len(batches),
+        "tokens": real,
+        "padded_tokens": padded,
+        "padding_ratio": round(1 - real / padded, 4) if padded else 0.0,
+    }
+
+
+class LengthBucketScheduler:
+    """
+    Forms embedding batches from texts of similar length under a token budget.
+    A 40 character CSV row batched with a 500 character Markdown chunk is padded to the chunk's
+    length, so most of the model's work goes to padding. The texts are sorted by token length
+    (longest first) and a batch is closed once len(batch) * longest > max_tokens or it has
+    max_batch_size texts; a text longer than the budget gets a batch of its own.
+    embed() returns the vectors in the order of the texts it got, and counts the real and padded
+    tokens of everything it embedded (see stats()). The padding is what the plan implies, an estimate:
+    a backend that splits a batch again (llama_index's embed_batch_size) or sorts it by length itself
+    (sentence-transformers) pads differently.
+    Token lengths come from count_tokens (the embedder's tokenizer) when given, otherwise they are estimated
+    from words and punctuation. They are capped at max_length, where the model truncates.
+    """
+    def __init__(self,
+                 max_tokens: int = 8192,
+                 max_batch_size: int = 64,
+                 count_tokens: Optional[Callable[[List[str]], Optional[List[int]]]] = None,
+                 max_length: Optional[int] = None,
+                 prefix: str = ""):
+        self.max_tokens = max_tokens
+        self.max_batch_size = max(1, max_batch_size)
+        self.count_tokens = count_tokens
+        self.max_length = max_length
+        self.prefix = prefix
+        self.texts = 0
+        self.batches = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def lengths(self, texts: List[str]) -> List[int]:
+        texts = [self.prefix + text for text in texts]
+        lengths = self.count_tokens(texts) if self.count_tokens is not None else None
+        if lengths is None:
+            # +2 for the [CLS] and [SEP] tokens
+            lengths = [len(_TOKEN.findall(text)) + 2 for text in texts]
+        if self.max_length:
+            lengths = [min(length, self.max_length) for length in lengths]
+        return lengths
+
+    def plan(self, lengths: List[int], max_batch_size: Optional[int] = None) -> List[List[int]]:
+        """Batches of indices into lengths, longest texts first."""
+        max_batch_size = max_batch_size or self.max_batch_size
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        for i in order:
+            # The first text of a batch is its longest, every text is padded to it
+            if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * lengths[batch[0]] > self.max_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def embed(self, texts: List[str], embed_batch: Callable[[List[str]], List[List[float]]],
+              lengths: Optional[List[int]] = None) -> List[List[float]]:
+        """
+        Embeds texts batch by batch with embed_batch, the vectors come back in the order of texts.
+        With lengths (from an earlier lengths()/plan()) the texts are one batch of that plan: they are
+        embedded as they are, without being tokenized and planned again.
+        """
+        if lengths is None:
+            lengths = self.lengths(texts)
+            batches = self.plan(lengths)
+        else:
+            batches = [list(range(len(texts)))] if texts else []
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for batch in batches:
+            for i, vector in zip(batch, embed_batch([texts[i] for i in batch])):
+                embeddings[i] = vector
+        stats = padding_stats(lengths, batches)
+        self.texts += len(texts)
+        self.batches += stats["batches"]
+        self.tokens += stats["tokens"]
+        self.padded_tokens += stats["padded_tokens"]
+        return embeddings
+
+    def reset_stats(self):
+        self.texts = self.batches = self.tokens = self.padded_tokens = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "texts": self.texts,
+            "batches": self.batches,
+            "tokens": self.tokens,
+            "padded_tokens": self.padded_tokens,
+            "padding_ratio": round(1 - self.tokens / self.padded_tokens, 4) if self.padded_tokens else 0.0,
+        }
@@ -0,0 +1,186 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+EMBED_BACKENDS = ("hf", "onnx")
+
+
+class Embedder:
+    """
+    What FAQEngine needs from an embedding backend. The methods are the ones of llama_index's
+    HuggingFaceEmbedding, so that class (or the stub of benchmark.py) can be passed in directly too.
+    - name: identifies the vectors in the embedding cache, backends giving different vectors need different names
+    - dim, max_length (tokens, longer texts are truncated), text_instruction / query_instruction (task prefixes)
+    - count_tokens(): token lengths for the length-bucketed scheduler, None when unknown
+    """
+    name = ""
+    dim = 0
+    max_length: Optional[int] = None
+    text_instruction = ""
+    query_instruction = ""
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Normalized embeddings of texts that already carry their prefix."""
+        raise NotImplementedError
+
+    def get_text_embedding_batch(self, texts: List[str], show_progress_bar: bool = False) -> List[List[float]]:
+        return self._embed([self.text_instruction + text for text in texts])
+
+    def get_text_embedding(self, text: str) -> List[float]:
+        return self.get_text_embedding_batch([text])[0]
+
+    def get_query_embedding_batch(self, queries: List[str]) -> List[List[float]]:
+        return self._embed([self.query_instruction + query for query in queries])
+
+    def get_query_embedding(self, query: str) -> List[float]:
+        return self.get_query_embedding_batch([query])[0]
+
+    def count_tokens(self, texts: List[str]) -> Optional[List[int]]:
+        return None
+
+
+class HuggingFaceEmbedder(Embedder):
+    """The PyTorch model through llama_index's HuggingFaceEmbedding (fp32, the reference backend)."""
+    def __init__(self, model_name: str, revision: str, intra_op_threads: Optional[int] = None):
+        # Imported here: llama_index pulls in torch, which takes seconds just to import
+        import torch
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+        from llama_index.embeddings.huggingface.utils import get_query_instruct_for_model_name, get_text_instruct_for_model_name
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        # HuggingFaceEmbedding  is a wrapping class like a loader, it doesn't provide model-it knows how to talk to Hugging Face Hub and download the model if not present locally
+        # Only when you pretty sure the custom model is safe, set trust_remote_code=True, otherwise it can be a security risk
+        self.model = HuggingFaceEmbedding(
+            model_name=model_name,
+            trust_remote_code=True,
+            revision=revision # <-- Pin to a specific commit revision to avoid future breaking changes, without this it will always get the latest version, using "main" is to get the latest version (can be unstable
+        )
+        self.name = model_name
+        self.dim = self.model._model.get_sentence_embedding_dimension()
+        self.max_length = self.model.max_length
+        self.text_instruction = self.model.text_instruction or get_text_instruct_for_model_name(model_name) or ""
+        self.query_instruction = self.model.query_instruction or get_query_instruct_for_model_name(model_name) or ""
+
+    def get_text_embedding_batch(self, texts: List[str], show_progress_bar: bool = False) -> List[List[float]]:
+        # llama_index adds the prefix itself
+        return self.model.get_text_embedding_batch(texts, show_progress_bar=show_progress_bar)
+
+    def get_query_embedding_batch(self, queries: List[str]) -> List[List[float]]:
+        # HuggingFaceEmbedding has no public batch call for queries, and get_text_embedding_batch would add the
+        # document prefix on top of ours. _embed(prompt_name="query") is what its get_query_embedding() calls,
+        # checked against llama-index-embeddings-huggingface==0.6.0 (pinned in requirements.txt, check it on upgrades).
+        return self.model._embed(queries, prompt_name="query")
+
+    def get_query_embedding(self, query: str) -> List[float]:
+        return self.model.get_query_embedding(query)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        return [len(ids) for ids in self.model._model.tokenizer(texts, add_special_tokens=True, truncation=False)["input_ids"]]
+
+
+class OnnxEmbedder(Embedder):
+    """
+    The model exported by export_onnx.py, run by ONNX Runtime on the CPU. No PyTorch at runtime,
+    the int8 copy (quantized=True) is about 4x smaller and usually 2-3x faster than the fp32 model.
+    Does what sentence-transformers does for nomic-embed: tokenize, mean pooling, L2 normalization.
+    intra_op_threads limits the threads of one model call (None lets ONNX Runtime use all cores).
+    """
+    def __init__(self, model_dir: str = "./onnx_model", quantized: bool = True, intra_op_threads: Optional[int] = None,
+                 batch_size: int = 32, revision: Optional[str] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / ("model_quantized.onnx" if quantized else "model.onnx")
+        info_path = model_dir / "export_info.json"
+        if not model_path.exists() or not info_path.exists():
+            raise FileNotFoundError(f"No exported model at {model_path}, run `python export_onnx.py --output {model_dir}` first.")
+        info = json.loads(info_path.read_text(encoding="utf-8"))
+        if revision and info["revision"] != revision:
+            raise ValueError(f"{model_dir} was exported from revision {info['revision']}, expected {revision}. Export it again.")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+        self.max_length = info["max_length"]
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.max_length)
+        self.tokenizer.enable_padding()  # to the longest text of the batch
+
+        self.name = f"{info['model_name']}+onnx{'-int8' if quantized else ''}"
+        self.dim = info["dim"]
+        self.text_instruction = info["text_instruction"]
+        self.query_instruction = info["query_instruction"]
+        self.batch_size = max(1, batch_size)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            inputs = {
+                "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            }
+            if "token_type_ids" in self.input_names:
+                inputs["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+            hidden = self.session.run(None, inputs)[0]
+            # Mean over the real tokens, padding excluded
+            mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            embeddings.extend(pooled.tolist())
+        return embeddings
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        # Padding is on, so count the attention mask instead of the ids
+        return [sum(encoding.attention_mask) for encoding in self.tokenizer.encode_batch(texts)]
+
+
+def make_embedder(backend: str,
+                  model_name: str,
+                  revision: str,
+                  onnx_model_dir: str = "./onnx_model",
+                  onnx_quantized: bool = True,
+                  intra_op_threads: Optional[int] = None) -> Embedder:
+    if backend == "hf":
+        return HuggingFaceEmbedder(model_name, revision, intra_op_threads=intra_op_threads)
+    if backend == "onnx":
+        return OnnxEmbedder(onnx_model_dir, quantized=onnx_quantized, intra_op_threads=intra_op_threads, revision=revision)
+    raise ValueError(f"Unknown embedding backend '{backend}', use one of {EMBED_BACKENDS}.")
+
+
+def parity_check(reference: Any, candidate: Any, texts: List[str], queries: List[str], top_k: int = 3) -> Dict[str, Any]:
+    """
+    How close the vectors of candidate are to the ones of reference (e.g. ONNX int8 vs HF fp32):
+    the cosine similarity of every document and query vector pair, and how often a query gets the
+    same top-k documents from both backends.
+    """
+    def as_matrix(vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    ref_docs, cand_docs = as_matrix(reference.get_text_embedding_batch(texts)), as_matrix(candidate.get_text_embedding_batch(texts))
+    ref_queries = as_matrix([reference.get_query_embedding(query) for query in queries])
+    cand_queries = as_matrix([candidate.get_query_embedding(query) for query in queries])
+
+    def cosine_stats(a, b):
+        cosines = (a * b).sum(axis=1)
+        return {"mean": float(cosines.mean()), "min": float(cosines.min()), "p5": float(np.percentile(cosines, 5))}
+
+    k = min(top_k, len(texts))
+    ref_top = np.argsort(-(ref_queries @ ref_docs.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(cand_queries @ cand_docs.T), axis=1)[:, :k]
+    return {
+        "documents": len(texts),
+        "queries": len(queries),
+        "document_cosine": cosine_stats(ref_docs, cand_docs),
+        "query_cosine": cosine_stats(ref_queries, cand_queries),
+        f"top{k}_overlap": float(np.mean([len(set(r) & set(c)) / k for r, c in zip(ref_top.tolist(), cand_top.tolist())])),
+        "top1_agreement": float(np.mean(ref_top[:, 0] == cand_top[:, 0])),
+    }
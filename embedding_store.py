@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+KEY_SIZE = 16  # bytes of an MD5 digest
+
+
+def content_key(text: str) -> bytes:
+    """Same MD5 the loader uses for the entry id, but as raw bytes to keep the index compact"""
+    return hashlib.md5(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    """
+    A persistent, append-only cache of document embeddings.
+    Each (model name, revision, task prefix) gets its own folder with:
+      - vectors.bin: a row-major float32/float16 matrix, read through np.memmap
+      - keys.bin:    the MD5 digest of the content for every row (row i of keys.bin is row i of vectors.bin)
+      - meta.json:   what the vectors were computed with
+    Rebuilding a collection from here only reads the file, the model is not touched.
+    One store can be shared by several engines (FAQEngine.for_collection), so reads and appends hold a lock,
+    and a row only becomes visible once its vector is in the file.
+    """
+    def __init__(self,
+                 directory: str,
+                 model_name: str,
+                 revision: str,
+                 task_prefix: str,
+                 dim: int,
+                 dtype: str = "float32"):
+        namespace = hashlib.md5(f"{model_name}|{revision}|{task_prefix}".encode("utf-8")).hexdigest()[:16]
+        self.path = Path(directory) / namespace
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.row_bytes = self.dim * self.dtype.itemsize
+        self.vectors_path = self.path / "vectors.bin"
+        self.keys_path = self.path / "keys.bin"
+        meta = {"model_name": model_name, "revision": revision, "task_prefix": task_prefix, "dim": dim, "dtype": self.dtype.name}
+
+        meta_path = self.path / "meta.json"
+        if meta_path.exists() and json.loads(meta_path.read_text(encoding="utf-8")) != meta:
+            # Same model but another dim/dtype: the old rows can't be read back, start over
+            self.vectors_path.unlink(missing_ok=True)
+            self.keys_path.unlink(missing_ok=True)
+        meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+        self._lock = threading.Lock()
+        self.rows = {}
+        self._matrix = None
+        self._load()
+
+    def _load(self):
+        keys = self.keys_path.read_bytes() if self.keys_path.exists() else b""
+        vectors_size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        # An interrupted write can leave one file longer than the other, only keep complete rows
+        count = min(len(keys) // KEY_SIZE, vectors_size // self.row_bytes)
+        if len(keys) != count * KEY_SIZE:
+            with open(self.keys_path, "r+b") as f:
+                f.truncate(count * KEY_SIZE)
+        if vectors_size != count * self.row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(count * self.row_bytes)
+        self.rows = {keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(count)}
+        self._matrix = None
+
+    def _open(self) -> Optional[np.memmap]:
+        # Called with the lock held; the map is reopened after every append, so it always covers all rows
+        if self._matrix is None and self.rows:
+            self._matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(len(self.rows), self.dim))
+        return self._matrix
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Returns the cached vector of every text, or None where it isn't cached yet"""
+        keys = [content_key(text) for text in texts]
+        with self._lock:
+            matrix = self._open()
+            results = []
+            for key in keys:
+                row = self.rows.get(key)
+                results.append(None if row is None else matrix[row].astype(np.float32).tolist())
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Appends the vectors of texts that are not cached yet"""
+        keys = [content_key(text) for text in texts]
+        with self._lock:
+            new_keys, new_rows, seen = [], [], set()
+            for key, vector in zip(keys, vectors):
+                if key in self.rows or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(vector)
+            if not new_keys:
+                return
+            # Vectors first: if we crash in between, _load() drops the rows that have no key
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.asarray(new_rows, dtype=self.dtype).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new_keys))
+            # Only now the rows can be read, through a map that covers them
+            start = len(self.rows)
+            for i, key in enumerate(new_keys):
+                self.rows[key] = start + i
+            self._matrix = None
@@ -0,0 +1,118 @@
+"""
+Exports the pinned embedding model to ONNX for the "onnx" backend (EMBED_BACKEND=onnx), quantizes it
+to int8 and checks it against the PyTorch model.
+
+Writes to --output:
+- model.onnx            fp32 export of the transformer (token embeddings; pooling happens in OnnxEmbedder)
+- model_quantized.onnx  dynamic int8 quantization of the weights (skipped with --no-quantize)
+- tokenizer.json        the fast tokenizer, used through the `tokenizers` package
+- export_info.json      model name, revision, dimension, max length and task prefixes
+
+Then (unless --skip-parity) embeds the knowledge base with both backends and reports the cosine
+agreement of the vectors, how often queries get the same top documents, and docs/sec of each.
+
+    python export_onnx.py --output ./onnx_model
+    python export_onnx.py --output ./onnx_model --skip-export --threads 4   # parity check only
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from embedders import HuggingFaceEmbedder, OnnxEmbedder, parity_check
+from loader import iter_allFiles
+from matryoshka_benchmark import queries_for
+from newRag import EMBED_MODEL_REVISION
+
+
+def export(reference: HuggingFaceEmbedder, model_name: str, revision: str, output: Path, quantize: bool, opset: int):
+    # Only needed for the export, the onnx backend itself runs without torch/transformers
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+    tokenizer.save_pretrained(output)
+    model = AutoModel.from_pretrained(model_name, revision=revision, trust_remote_code=True).eval()
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    sample = tokenizer(["search_document: an example text", "search_document: a second, longer example text"],
+                       padding=True, return_tensors="pt")
+    print(f"Exporting {model_name}@{revision} to {output / 'model.onnx'}...")
+    torch.onnx.export(
+        TokenEmbeddings(model),
+        (sample["input_ids"], sample["attention_mask"]),
+        str(output / "model.onnx"),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"},
+        },
+        opset_version=opset,
+    )
+    if quantize:
+        print("Quantizing the weights to int8...")
+        quantize_dynamic(str(output / "model.onnx"), str(output / "model_quantized.onnx"), weight_type=QuantType.QInt8)
+
+    info = {
+        "model_name": model_name,
+        "revision": revision,
+        "dim": reference.dim,
+        "max_length": reference.max_length,
+        "text_instruction": reference.text_instruction,
+        "query_instruction": reference.query_instruction,
+    }
+    (output / "export_info.json").write_text(json.dumps(info, indent=2), encoding="utf-8")
+    for path in sorted(output.glob("*.onnx")):
+        print(f"{path.name}: {path.stat().st_size / 1e6:.1f} MB")
+
+
+def docs_per_second(embedder, texts) -> float:
+    embedder.get_text_embedding_batch(texts[:4])  # warm-up
+    start = time.perf_counter()
+    embedder.get_text_embedding_batch(texts)
+    return round(len(texts) / (time.perf_counter() - start), 2)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export, quantize and check the ONNX embedding backend.")
+    parser.add_argument("--model", default="nomic-ai/nomic-embed-text-v1.5")
+    parser.add_argument("--revision", default=EMBED_MODEL_REVISION)
+    parser.add_argument("--output", default="./onnx_model")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--skip-export", action="store_true", help="only run the parity check on an existing export")
+    parser.add_argument("--skip-parity", action="store_true")
+    parser.add_argument("--knowledge-base", default="./knowledgebase")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads of both backends")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="exit with an error if the mean document cosine is lower")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output = Path(args.output)
+    reference = HuggingFaceEmbedder(args.model, args.revision, intra_op_threads=args.threads)
+    if not args.skip_export:
+        export(reference, args.model, args.revision, output, not args.no_quantize, args.opset)
+    if args.skip_parity:
+        raise SystemExit(0)
+
+    candidate = OnnxEmbedder(str(output), quantized=not args.no_quantize, intra_op_threads=args.threads, revision=args.revision)
+    entries = list(iter_allFiles(args.knowledge_base))
+    texts = [entry["content"] for entry in entries]
+    report = parity_check(reference, candidate, texts, queries_for(entries))
+    report["docs_per_second"] = {"hf": docs_per_second(reference, texts), candidate.name: docs_per_second(candidate, texts)}
+    print(json.dumps(report, indent=2))
+    if report["document_cosine"]["mean"] < args.min_cosine:
+        raise SystemExit(f"Mean document cosine {report['document_cosine']['mean']:.4f} is below {args.min_cosine}.")
@@ -0,0 +1,170 @@
+"""
+Recall-vs-latency sweep for the Qdrant collection settings.
+
+For every build configuration (HNSW m x ef_construct x quantization) a temporary collection is
+created, filled and optimized; then every search setting (hnsw_ef values and exact) is measured:
+recall@k against brute-force NumPy results, mean/p50/p95 latency per query and the index build time.
+Pick the cheapest row that reaches the recall you need and set the QDRANT_* variables of mcp_server.py.
+
+    python hnsw_sweep.py --count 50000 --m 8,16,32 --ef-construct 100 --quantization none,scalar --hnsw-ef 16,32,64,128
+    python hnsw_sweep.py --source knowledgebase --embedder hf   # the real corpus and model
+
+Needs a Qdrant server (Qdrant's local mode has no HNSW index, every search there is exact).
+The queries are corpus vectors plus noise, so there is always a true neighbourhood to find.
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from qdrant_client import models
+
+from vector_store import QdrantVectorStore
+
+
+def parse_list(text: str, cast=int) -> List[Any]:
+    return [None if item in ("none", "default") else cast(item) for item in text.split(",") if item]
+
+
+def synthetic_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, count // 100), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def knowledge_base_vectors(directory: str, embedder: str) -> np.ndarray:
+    from loader import load_allFiles
+    from newRag import FAQEngine
+
+    embed_model, cache_dir = None, "./embedding_cache"  # the real model reuses the ingestion's embedding cache
+    if embedder == "stub":
+        from benchmark import StubEmbedding
+        embed_model, cache_dir = StubEmbedding(), None
+    engine = FAQEngine(qdrant_url=":memory:", collection_name="sweep_embedding", embedding_cache_dir=cache_dir,
+                       lexical_index_dir=None, embed_model=embed_model)
+    contents = [entry["content"] for entry in load_allFiles(directory, dump_path=None)]
+    return np.asarray(engine.embed_documents(contents), dtype=np.float32)
+
+
+def make_queries(vectors: np.ndarray, count: int, noise: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    picked = vectors[rng.integers(0, len(vectors), count)]
+    queries = picked + noise * rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, min(k, len(vectors) - 1), axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def build(url: str, name: str, vectors: np.ndarray, m: Optional[int], ef_construct: Optional[int],
+          quantization: Optional[str], indexing_threshold: int, batch_size: int = 1024) -> Dict[str, Any]:
+    store = QdrantVectorStore(url, name, hnsw_m=m, hnsw_ef_construct=ef_construct, quantization=quantization,
+                              indexing_threshold=indexing_threshold)
+    if store.exists():
+        store.client.delete_collection(name)
+    store.create(vectors.shape[1])
+    store.begin_ingest()
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), batch_size):
+        batch = vectors[offset:offset + batch_size]
+        # Only the last upsert waits, Qdrant applies them in order
+        last = offset + batch_size >= len(vectors)
+        store.upsert([models.PointStruct(id=offset + i, vector=vector.tolist()) for i, vector in enumerate(batch)], wait=last)
+    upload_seconds = time.perf_counter() - start
+    store.end_ingest()
+    indexed = store.wait_for_index()
+    return {"store": store, "upload_seconds": upload_seconds, "build_seconds": time.perf_counter() - start, "indexed": indexed}
+
+
+def measure(store: QdrantVectorStore, queries: np.ndarray, truth: List[set], k: int,
+            params: Optional[models.SearchParams]) -> Dict[str, float]:
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = store.search(query.tolist(), limit=k, search_params=params)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(expected & {hit.id for hit in hits}) / len(expected))
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "recall": float(np.mean(recalls)),
+        "mean_ms": float(latencies_ms.mean()),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recall vs latency of Qdrant HNSW / quantization settings.")
+    parser.add_argument("--qdrant-url", default="http://localhost:6333")
+    parser.add_argument("--source", choices=("synthetic", "knowledgebase"), default="synthetic")
+    parser.add_argument("--knowledge-base", default="./knowledgebase")
+    parser.add_argument("--embedder", choices=("stub", "hf"), default="stub", help="for --source knowledgebase")
+    parser.add_argument("--count", type=int, default=20000, help="synthetic vectors")
+    parser.add_argument("--dim", type=int, default=768, help="synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="query noise relative to a unit vector")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--m", default="16", help="comma separated HNSW m values")
+    parser.add_argument("--ef-construct", default="100", help="comma separated ef_construct values")
+    parser.add_argument("--quantization", default="none,scalar", help="comma separated: none, scalar, binary")
+    parser.add_argument("--hnsw-ef", default="16,32,64,128,256", help="comma separated search-time ef values")
+    parser.add_argument("--oversampling", type=float, default=2.0, help="candidates fetched per result with quantization")
+    parser.add_argument("--indexing-threshold", type=int, default=1, help="KB; 1 builds the index even for small corpora")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the sweep collections")
+    parser.add_argument("--output", default="hnsw_sweep_results.json")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.qdrant_url.startswith(("http://", "https://")):
+        print("Warning: Qdrant local mode searches exactly, recall will be 1.0 for every setting.")
+
+    if args.source == "synthetic":
+        vectors = synthetic_vectors(args.count, args.dim, args.seed)
+    else:
+        vectors = knowledge_base_vectors(args.knowledge_base, args.embedder)
+    k = min(args.top_k, len(vectors))
+    queries = make_queries(vectors, args.queries, args.noise, args.seed)
+    truth = exact_top_k(vectors, queries, k)
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries, recall@{k}")
+
+    rows = []
+    print(f"{'m':>4} {'ef_c':>5} {'quant':>7} {'search':>10} {'recall':>7} {'mean ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for quantization in parse_list(args.quantization, str):
+        for m in parse_list(args.m):
+            for ef_construct in parse_list(args.ef_construct):
+                name = f"hnsw_sweep_m{m}_ef{ef_construct}_{quantization}"
+                built = build(args.qdrant_url, name, vectors, m, ef_construct, quantization, args.indexing_threshold)
+                store = built["store"]
+                searches = [(f"ef={ef}", ef, False) for ef in parse_list(args.hnsw_ef)] + [("exact", None, True)]
+                for label, ef, exact in searches:
+                    params = store.make_search_params(
+                        hnsw_ef=ef, exact=exact,
+                        rescore=True if quantization else None,
+                        oversampling=args.oversampling if quantization else None,
+                    )
+                    result = measure(store, queries, truth, k, params)
+                    row = {
+                        "m": m, "ef_construct": ef_construct, "quantization": quantization,
+                        "hnsw_ef": ef, "exact": exact,
+                        "build_seconds": built["build_seconds"], "indexed": built["indexed"], **result,
+                    }
+                    rows.append(row)
+                    print(f"{str(m):>4} {str(ef_construct):>5} {str(quantization):>7} {label:>10} {result['recall']:7.3f} "
+                          f"{result['mean_ms']:8.2f} {result['p95_ms']:8.2f} {built['build_seconds']:8.1f}")
+                if not args.keep:
+                    store.client.delete_collection(name)
+                store.close()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"vectors": len(vectors), "dim": int(vectors.shape[1]), "queries": len(queries), "top_k": k,
+                   "config": vars(args), "results": rows}, f, indent=2)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_DONE = object()  # sentinel that tells the next stage there is nothing more to come
+
+
+class StageStats:
+    """Counts how many entries a stage handled, how long it worked and how long it sat waiting on its neighbours."""
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+
+    @contextmanager
+    def timing(self, attr: str = "busy"):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, attr, getattr(self, attr) + time.perf_counter() - start)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy, 4),
+            "waiting_seconds": round(self.waiting, 4),
+            "items_per_second": round(self.items / self.busy, 2) if self.busy else None,
+        }
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    # Blocks while the queue is full (backpressure), but gives up if another stage failed
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def run_ingest_pipeline(entries: Iterable[Dict],
+                        embed: Callable[[List[str]], List[List[float]]],
+                        upload: Callable[[List[Dict], List[List[float]]], None],
+                        batch_size: int = 64,
+                        queue_size: int = 4,
+                        on_batch: Optional[Callable[[int], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs ingestion as three overlapping stages connected by bounded queues:
+      load   - pulls entries from `entries` (can be a lazy loader generator) and groups them in batches
+      embed  - turns a batch of contents into vectors
+      upload - hands entries and vectors to `upload` (runs in the calling thread)
+    A full queue blocks the stage in front of it, so a slow Qdrant can't make vectors pile up in memory:
+    at most `queue_size` batches wait between two stages.
+    Returns the per-stage statistics; the stage with the most busy time is the bottleneck.
+    """
+    stats = {name: StageStats(name) for name in ("load", "embed", "upload")}
+    batches: queue.Queue = queue.Queue(maxsize=queue_size)
+    embedded: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def load_stage():
+        try:
+            iterator = iter(entries)
+            while True:
+                with stats["load"].timing():
+                    batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
+                stats["load"].items += len(batch)
+                with stats["load"].timing("waiting"):
+                    if not _put(batches, batch, stop):
+                        return
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(batches, _DONE, stop)
+
+    def embed_stage():
+        try:
+            while True:
+                with stats["embed"].timing("waiting"):
+                    batch = _get(batches, stop)
+                if batch is _DONE:
+                    break
+                with stats["embed"].timing():
+                    vectors = embed([entry["content"] for entry in batch])
+                stats["embed"].items += len(batch)
+                with stats["embed"].timing("waiting"):
+                    if not _put(embedded, (batch, vectors), stop):
+                        return
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(embedded, _DONE, stop)
+
+    workers = [
+        threading.Thread(target=load_stage, name="ingest-load", daemon=True),
+        threading.Thread(target=embed_stage, name="ingest-embed", daemon=True),
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        while True:
+            with stats["upload"].timing("waiting"):
+                item = _get(embedded, stop)
+            if item is _DONE:
+                break
+            batch, vectors = item
+            with stats["upload"].timing():
+                upload(batch, vectors)
+            stats["upload"].items += len(batch)
+            if on_batch is not None:
+                on_batch(len(batch))
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+
+    if errors:
+        raise errors[0]
+    return {name: stage.to_dict() for name, stage in stats.items()}
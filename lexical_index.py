@@ -0,0 +1,130 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Keeps identifiers like __slots__, get_item or kwargs in one piece
+TOKEN_PATTERN = re.compile(r"[a-z_][a-z0-9_]*|\d+")
+
+# English function words. Questions are full of them ("what is a dict"), and matching only on them pulls
+# unrelated entries into the results. Words that are also Python keywords or builtins (for, while, is, in,
+# all, any...) are left out so they can still be searched for.
+STOPWORDS = frozenset("""
+a about above after again am an are at be because been before being below between both but by
+can could did do does doing down during each few further had has have having he her here hers him his
+how i into it its itself just me more most my no nor of off on once only other our out over own
+same she should so some such than that the their them then there these they this those through to too under
+until up very was we were what when where which who whom why will would you your
+""".split())
+
+
+def tokenize(text: str, keep_stopwords: bool = False) -> List[str]:
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if keep_stopwords:
+        return tokens
+    return [token for token in tokens if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    An inverted index with BM25 scoring over the normalized `content` of the entries.
+    It is kept next to the vector collection and updated with the same upserts/deletes, so exact
+    API names (enumerate, __slots__, yield) can be found without the embedding model.
+    Only `content` and `source` are kept per document, that is all the answer formatting needs.
+    """
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}  # needed to remove a document again
+        self.doc_length: Dict[str, int] = {}
+        self.docs: Dict[str, Dict[str, str]] = {}
+        self.total_length = 0
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            for doc_id, doc in data.get("docs", {}).items():
+                self._add(doc_id, doc["content"], doc["source"])
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.postings
+
+    def _add(self, doc_id: str, content: str, source: str):
+        terms = Counter(tokenize(content))
+        self.doc_terms[doc_id] = dict(terms)
+        self.doc_length[doc_id] = sum(terms.values())
+        self.docs[doc_id] = {"content": content, "source": source}
+        self.total_length += self.doc_length[doc_id]
+        for term, freq in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = freq
+
+    def _remove(self, doc_id: str):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.docs.pop(doc_id, None)
+        self.total_length -= self.doc_length.pop(doc_id)
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def upsert(self, entries: List[Dict]):
+        with self._lock:
+            for entry in entries:
+                self._remove(entry["id"])
+                self._add(entry["id"], entry["content"], entry.get("source", ""))
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self.postings, self.doc_terms, self.doc_length, self.docs, self.total_length = {}, {}, {}, {}, 0
+
+    def search(self, query: str, limit: int, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """Returns (id, BM25 score) of the best matching documents with at least min_score, best first."""
+        with self._lock:
+            doc_count = len(self.docs)
+            if not doc_count:
+                return []
+            avg_length = self.total_length / doc_count
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, freq in docs.items():
+                    norm = freq * (self.k1 + 1) / (freq + self.k1 * (1 - self.b + self.b * self.doc_length[doc_id] / avg_length))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+            hits = [(doc_id, score) for doc_id, score in scores.items() if score >= min_score]
+            return sorted(hits, key=lambda item: item[1], reverse=True)[:limit]
+
+    def save(self):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(json.dumps({"docs": self.docs}, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Merges several ranked id lists: every list adds 1 / (k + rank) to the ids it contains."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
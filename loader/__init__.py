@@ -1,14 +1,22 @@
 from .helper.normalize import normalize
 from .helper.chucky import chucky
-from .core import load_csv, load_json, load_yaml, load_markdown, load_text, load_allFiles
+from .helper.chunker import stream_chunks, chunk_text
+from .helper.manifest import IngestionManifest
+from .helper.dedupe import deduplicate
+from .core import load_csv, load_json, load_yaml, load_markdown, load_text, load_allFiles, iter_allFiles
 
 __all__ = [
     "normalize",
     "chucky",
+    "stream_chunks",
+    "chunk_text",
+    "IngestionManifest",
+    "deduplicate",
     "load_json",    
     "load_yaml",
     "load_markdown",
     "load_text",
     "load_csv",
-    "load_allFiles"
+    "load_allFiles",
+    "iter_allFiles"
 ]
\ No newline at end of file
@@ -1,9 +1,11 @@
 import csv
 import json
+import time
 import yaml
 from pathlib import Path
-from typing import List, Dict
-from . import normalize, chucky
+from typing import List, Dict, Iterator, Optional
+from . import normalize
+from .helper.chunker import stream_chunks
 
 def load_csv(file_path: Path) -> List[Dict]:
     entries = []
@@ -36,42 +38,53 @@ def load_yaml(path: Path) -> List[Dict]:
     return entries
 
 def load_markdown(path: Path) -> List[Dict]:
-    content = path.read_text(encoding="utf-8")
-    chunks = chucky(content)
-    if chunks:
-        return [normalize({"content": chunk}, f"{path.name}#part{index}") for index, chunk in enumerate(chunks)]
-    return [normalize({"content": content}, path.name)]
+    # stream_chunks reads the file in blocks and never makes a chunk larger than 500 characters
+    entries = [normalize({"content": chunk}, f"{path.name}#part{index}") for index, chunk in enumerate(stream_chunks(path, max_chars=500))]
+    return entries or [normalize({"content": ""}, path.name)]
 
 def load_text(path: Path) -> List[Dict]:
-    content = path.read_text(encoding="utf-8")
-    chunks = chucky(content)
-    if chunks:
-        return [normalize({"content": chunk}, f"{path.name}#part{index}") for index, chunk in enumerate(chunks)]
-    return [normalize({"content": content}, path.name)]
+    entries = [normalize({"content": chunk}, f"{path.name}#part{index}") for index, chunk in enumerate(stream_chunks(path, max_chars=500))]
+    return entries or [normalize({"content": ""}, path.name)]
 
 
-def load_allFiles(directory: str) -> List[Dict]:
-    all_entries = []
-    supported_extensions = {".csv", ".json", ".yaml", ".yml", ".md", ".txt"}
+def iter_allFiles(directory: str, workers: int = 0, chunksize: int = 8) -> Iterator[Dict]:
+    """
+    Yields the entries file by file, so ingestion can start before the whole tree is parsed.
+    With workers > 0 the files are parsed in a process pool; the order of the entries stays the same.
+    """
+    # imported here because loaders.py imports the load_* functions of this module
+    from .loaders import list_files
     # Iterate through all files in the directory and its subdirectories
-    for path in Path(directory).rglob("*"):
-        if path.suffix.lower() not in supported_extensions:
-            continue
-            
-        match path.suffix.lower():
-            case ".csv":
-                all_entries.extend(load_csv(path))
-            case ".json":
-                all_entries.extend(load_json(path))
-            case ".yaml" | ".yml":
-                all_entries.extend(load_yaml(path))
-            case ".md":
-                all_entries.extend(load_markdown(path))
-            case ".txt":
-                all_entries.extend(load_text(path))    
+    yield from _iter_paths(list_files(directory), workers, chunksize)
+
+
+def _iter_paths(paths: List[Path], workers: int, chunksize: int) -> Iterator[Dict]:
+    from .loaders import LOADERS, iter_files_parallel
+
+    if workers > 0 and len(paths) > 1:
+        for entries in iter_files_parallel(paths, workers=workers, chunksize=chunksize):
+            yield from entries
+        return
+    for path in paths:
+        yield from LOADERS[path.suffix.lower()](path)
+
+
+def load_allFiles(directory: str, workers: int = 0, chunksize: int = 8, dump_path: Optional[str] = "all_entries.json") -> List[Dict]:
+    """Loads every file of directory; the entries are also written to dump_path (None skips that) for inspection."""
+    from .loaders import list_files
+
+    start = time.perf_counter()
+    paths = list_files(directory)
+    all_entries = list(_iter_paths(paths, workers, chunksize))
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {len(paths)} files in {elapsed:.2f}s ({len(paths) / elapsed if elapsed else 0:.1f} files/sec, workers={workers or 1}).")
     
-    print(f"Total entries loaded: {len(all_entries)} and saved to all_entries.json...")
-    json.dump(all_entries, open("all_entries.json", "w", encoding="utf-8"), indent=2, ensure_ascii=False)
+    if dump_path:
+        print(f"Total entries loaded: {len(all_entries)} and saved to {dump_path}...")
+        with open(dump_path, "w", encoding="utf-8") as f:
+            json.dump(all_entries, f, indent=2, ensure_ascii=False)
+    else:
+        print(f"Total entries loaded: {len(all_entries)}")
     return all_entries
 
 # used for testing
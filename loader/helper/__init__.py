@@ -1,3 +1,3 @@
-from . import chucky, normalize
+from . import chucky, chunker, normalize, manifest, dedupe
 
-__all__=["chucky", "normalize"]
\ No newline at end of file
+__all__=["chucky", "chunker", "normalize", "manifest", "dedupe"]
\ No newline at end of file
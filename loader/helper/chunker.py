@@ -0,0 +1,211 @@
+import re
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Union
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"\S+\s*")
+HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+
+
+def iter_paragraphs(file: TextIO, block_size: int = 1 << 16) -> Iterator[str]:
+    """
+    Yields the paragraphs of a text file exactly like content.split("\\n\\n") would, but reads the file
+    in blocks of block_size characters. A long paragraph is collected as a list of pieces and joined
+    once, so nothing is copied over and over.
+    """
+    pending: List[str] = []
+    while True:
+        block = file.read(block_size)
+        if not block:
+            break
+        # The "\n\n" separator can be split between two blocks
+        if pending and pending[-1].endswith("\n") and block.startswith("\n"):
+            pending[-1] = pending[-1][:-1]
+            yield "".join(pending)
+            pending = []
+            block = block[1:]
+        parts = block.split("\n\n")
+        pending.append(parts[0])
+        for part in parts[1:]:
+            yield "".join(pending)
+            pending = [part]
+    yield "".join(pending)
+
+
+def _split_oversized(text: str, limit: int, size: Callable[[str], int], measure_joined: bool = False) -> List[str]:
+    """
+    Cuts a paragraph that is larger than limit: at sentence ends, then between words, then anywhere.
+    In character mode the joining spaces count; with measure_joined (token mode) the joined piece is
+    measured instead, a space is not a token.
+    """
+    pieces, current, current_size = [], [], 0
+
+    def grown_size(unit: str, unit_size: int) -> int:
+        if not current:
+            return unit_size
+        return size(" ".join(current + [unit])) if measure_joined else current_size + 1 + unit_size
+
+    for unit in SENTENCE_END.split(text):
+        words = WORD.findall(unit) if size(unit) > limit else [unit]
+        for word in words:
+            word = word.strip()
+            if not word:
+                continue
+            word_size = size(word)
+            if word_size > limit:
+                if current:
+                    pieces.append(" ".join(current))
+                    current, current_size = [], 0
+                # No whitespace to cut at: hard cut (a character is never more than one token, but count_tokens
+                # may add special tokens to every call)
+                step = max(1, limit - (size("") if measure_joined else 0))
+                pieces.extend(word[i:i + step] for i in range(0, len(word), step))
+                continue
+            new_size = grown_size(word, word_size)
+            if current and new_size > limit:
+                pieces.append(" ".join(current))
+                current, new_size = [], word_size
+            current.append(word)
+            current_size = new_size
+    if current:
+        pieces.append(" ".join(current))
+    return [piece for piece in (piece.strip() for piece in pieces) if piece]
+
+
+def chunk_paragraphs(paragraphs: Iterable[str],
+                     max_chars: int = 500,
+                     overlap: int = 0,
+                     heading_context: bool = False,
+                     max_tokens: Optional[int] = None,
+                     count_tokens: Optional[Callable[[str], int]] = None) -> Iterator[str]:
+    """
+    Packs paragraphs into chunks with a hard size limit, in one pass.
+    - The limit is max_chars characters, or max_tokens tokens measured with count_tokens
+      (e.g. lambda text: len(tokenizer.tokenize(text)) for the embedding model's tokenizer).
+      In token mode the chunk as it would be emitted is measured, separators are not charged as tokens.
+    - A paragraph larger than the limit is cut at sentence ends or between words instead of being
+      emitted as one oversized chunk that the embedder would silently truncate.
+    - overlap repeats the last `overlap` characters/tokens of a chunk at the start of the next one.
+    - heading_context prefixes every chunk of a Markdown file with the headings it belongs to.
+    With the defaults the chunks are the same as chucky() gives (except that no paragraph is too long):
+    like chucky, character mode charges 2 for the "\\n\\n" after every paragraph, but a paragraph of up to
+    max_chars still fits into an empty chunk.
+    """
+    token_mode = max_tokens is not None
+    if token_mode:
+        if count_tokens is None:
+            raise ValueError("count_tokens is required when max_tokens is set.")
+        limit, size = max_tokens, count_tokens
+    else:
+        limit, size = max_chars, len
+
+    headings: List[str] = []
+    parts: List[str] = []
+    parts_size = 0
+    budget = limit
+    prefix = ""
+
+    def render(chunk_parts: List[str]) -> str:
+        chunk = "\n\n".join(chunk_parts).strip()
+        return f"{prefix}\n\n{chunk}" if prefix and chunk else chunk
+
+    def fits(piece: str) -> bool:
+        if token_mode:
+            return size(render(parts + [piece])) <= limit
+        if not parts:
+            return size(piece) <= budget
+        return parts_size + size(piece) + 2 <= budget
+
+    def emit() -> Optional[str]:
+        return render(parts) or None
+
+    def start_chunk(previous: Optional[str]):
+        nonlocal parts, parts_size, budget, prefix
+        prefix = " > ".join(headings) if heading_context else ""
+        if prefix and size(prefix) > limit // 4:
+            prefix = ""  # a heading path that eats the chunk is not worth keeping
+        budget = limit - (size(prefix) + 2 if prefix else 0)
+        parts, parts_size = [], 0
+        if overlap > 0 and previous:
+            tail = _tail(previous, overlap, size)
+            if tail:
+                parts, parts_size = [tail], size(tail) + 2
+
+    start_chunk(None)
+    for paragraph in paragraphs:
+        if heading_context:
+            match = HEADING.match(paragraph.strip())
+            if match:
+                level = len(match.group(1))
+                headings = headings[:level - 1] + [match.group(2).strip()]
+                if not parts:
+                    # Nothing in this chunk yet (e.g. the first one): it starts under the new heading
+                    start_chunk(None)
+
+        pieces = deque([paragraph])
+        while pieces:
+            piece = pieces.popleft()
+            if parts and fits(piece):
+                parts.append(piece)
+                parts_size += size(piece) + 2
+                continue
+            if not parts:
+                if not fits(piece):
+                    # Too big even for an empty chunk: cut it (budget can shrink when a heading prefix starts)
+                    cut_limit = limit - (size(prefix + "\n\n") if prefix else 0) if token_mode else budget
+                    cut = _split_oversized(piece, max(1, cut_limit), size, token_mode)
+                    if cut != [piece]:
+                        pieces.extendleft(reversed(cut))
+                        continue
+                    # Can't be cut any further (tokens that don't add up across the prefix): keep it as it is
+                parts.append(piece)
+                parts_size += size(piece) + 2
+                continue
+            previous = emit()
+            if previous is not None:
+                yield previous
+            start_chunk(previous)
+            if parts and not fits(piece):
+                # The overlap doesn't leave room for this piece
+                parts, parts_size = [], 0
+            pieces.appendleft(piece)
+
+    last = emit()
+    if last is not None:
+        yield last
+
+
+def _tail(chunk: str, overlap: int, size: Callable[[str], int]) -> str:
+    """The end of a chunk, at most `overlap` long, starting at a word."""
+    # Only look at the end of the chunk, and widen the window if all of it fits into the overlap
+    window = 8 * overlap + 64
+    while True:
+        start = max(0, len(chunk) - window)
+        words = WORD.findall(chunk, start)
+        if start and words:
+            words = words[1:]  # the first word may be cut by the window
+        tail: List[str] = []
+        tail_size = 0
+        complete = False
+        for word in reversed(words):
+            word_size = size(word)
+            if tail_size + word_size > overlap:
+                complete = True
+                break
+            tail.append(word)
+            tail_size += word_size
+        if complete or not start:
+            return "".join(reversed(tail)).strip()
+        window *= 2
+
+
+def stream_chunks(path: Union[str, Path], block_size: int = 1 << 16, encoding: str = "utf-8", **options) -> Iterator[str]:
+    """Chunks a Markdown/TXT file without reading it whole. options are passed to chunk_paragraphs()."""
+    with open(path, "r", encoding=encoding) as file:
+        yield from chunk_paragraphs(iter_paragraphs(file, block_size), **options)
+
+
+def chunk_text(content: str, **options) -> List[str]:
+    """Same chunking for a string that is already in memory."""
+    return list(chunk_paragraphs(content.split("\n\n"), **options))
@@ -0,0 +1,109 @@
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+WORD = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 3) -> np.ndarray:
+    """
+    Hashes of the word n-grams of a text, lowercased and without punctuation, so
+    "What is a list?" and "what is a list" give the same set.
+    """
+    words = WORD.findall(text.lower())
+    if len(words) < size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    # crc32 is stable between processes (hash() is not) and fast enough
+    return np.unique(np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams)))
+
+
+class MinHashDeduplicator:
+    """
+    Near-duplicate detection with MinHash signatures and LSH buckets.
+    Every entry gets num_perm min-hashes of its shingles; the signature is cut into `bands` bands and
+    entries sharing a band land in the same bucket. Only entries sharing a bucket are compared, so
+    the work grows with the number of entries, not with its square. A candidate is a duplicate when
+    the share of equal min-hashes (an estimate of the Jaccard similarity of the shingles) is at least
+    threshold. With 128 hashes in 16 bands of 8, pairs above ~0.7 similarity almost always meet.
+    The first entry of a group is kept; entries are processed in order.
+    """
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, bands: int = 16, shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing of the 32 bit shingle hashes: ((a * h + b) mod 2**64) >> 32, a odd
+        self._a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text, self.shingle_size)
+        values = (np.outer(hashes, self._a) + self._b) >> np.uint64(32)  # wraps around on purpose
+        return values.min(axis=0)
+
+    def add(self, text: str) -> Optional[int]:
+        """
+        Returns the index of the earlier entry this text duplicates, or None if it is new
+        (then it is added and can be matched by later texts).
+        """
+        signature = self.signature(text)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        seen = set()
+        for band, key in enumerate(keys):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    return candidate
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(index)
+        return None
+
+
+def deduplicate(entries: List[Dict], mode: str = "merge", threshold: float = 0.85, **options) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Removes near-duplicate entries (same Q&A with different punctuation, overlapping chunks...).
+    mode "drop" keeps the first entry of a group as it is, "merge" also collects the sources of the
+    dropped entries in the kept one (`sources` list, and `source` lists them all comma separated).
+    Returns the kept entries and stats: entries, kept, duplicates (embeddings saved) and
+    near_duplicates (duplicates with a different id, i.e. points saved in the index).
+    """
+    if mode not in ("drop", "merge"):
+        raise ValueError(f"Unknown dedupe mode '{mode}', use 'drop' or 'merge'.")
+    deduplicator = MinHashDeduplicator(threshold=threshold, **options)
+    kept: List[Dict] = []
+    near_duplicates = 0
+    for entry in entries:
+        original = deduplicator.add(entry.get("content", ""))
+        if original is None:
+            kept.append(entry)
+            continue
+        target = kept[original]
+        if target["id"] != entry["id"]:
+            near_duplicates += 1
+        if mode == "merge":
+            sources = target.get("sources") or [target.get("source", "unknown")]
+            if entry.get("source") not in sources:
+                # A copy, the caller's entries are not modified
+                sources = sources + [entry.get("source")]
+                kept[original] = {**target, "sources": sources, "source": ", ".join(sources)}
+    stats = {
+        "entries": len(entries),
+        "kept": len(kept),
+        "duplicates": len(entries) - len(kept),
+        "near_duplicates": near_duplicates,
+    }
+    return kept, stats
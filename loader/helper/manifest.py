@@ -0,0 +1,114 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+
+def file_fingerprint(path: Path) -> Dict:
+    """Returns the mtime, size and sha256 of a file"""
+    stat = path.stat()
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest.hexdigest()}
+
+
+def entry_fingerprint(entry: Dict) -> str:
+    """Stable hash of everything we store for an entry (payload + id), so a changed source/question/answer counts as an update"""
+    return hashlib.md5(json.dumps(entry, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class IngestionManifest:
+    """
+    Remembers what was ingested into a collection so that the next run only embeds what changed.
+    files:   {relative path: {"mtime", "size", "sha256"}} of the knowledge base files
+    entries: {normalize() id: fingerprint of the entry}
+    settings: the ingestion settings that change what is stored (e.g. the dedupe mode), a run with other
+              settings has to go through the entries again even if no file changed
+    """
+    def __init__(self, path: str = "./ingestion_manifest.json", collection_name: str = "", settings: Optional[Dict] = None):
+        self.path = Path(path)
+        self.collection_name = collection_name
+        self.settings: Dict = settings or {}
+        self.saved_settings: Dict = {}
+        self.files: Dict[str, Dict] = {}
+        self.entries: Dict[str, str] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            # A manifest written for another collection tells us nothing about this one
+            if data.get("collection") == collection_name:
+                self.files = data.get("files", {})
+                self.entries = data.get("entries", {})
+                self.saved_settings = data.get("settings", {})
+
+    def scan_files(self, directory: str) -> Dict[str, Dict]:
+        """Fingerprints all files a loader is registered for, reusing the stored sha256 when mtime and size are unchanged"""
+        from ..loaders import LOADERS
+
+        files = {}
+        for path in sorted(Path(directory).rglob("*")):
+            if path.suffix.lower() not in LOADERS or not path.is_file():
+                continue
+            key = path.relative_to(directory).as_posix()
+            stat = path.stat()
+            known = self.files.get(key)
+            if known and known["mtime"] == stat.st_mtime and known["size"] == stat.st_size:
+                files[key] = known
+            else:
+                files[key] = file_fingerprint(path)
+        return files
+
+    def files_changed(self, directory: str) -> bool:
+        """True if any file was added, removed or modified since the manifest was saved"""
+        if not self.entries:
+            return True
+        current = self.scan_files(directory)
+        if current.keys() != self.files.keys():
+            return True
+        return any(current[key]["sha256"] != self.files[key]["sha256"] for key in current)
+
+    def settings_changed(self) -> bool:
+        """True if the manifest was saved with other ingestion settings than the current ones"""
+        return self.settings != self.saved_settings
+
+    def track_files(self, directory: str):
+        """Records the current state of the knowledge base files (saved together with the entries)"""
+        self.files = self.scan_files(directory)
+
+    def diff(self, faq_contexts: List[Dict]) -> Tuple[List[Dict], List[Dict], List[str], int]:
+        """
+        Compares the entries against the manifest.
+        Returns (added, updated, removed_ids, skipped_count). Duplicated ids keep the last entry,
+        the same way Qdrant would overwrite the point on upsert.
+        """
+        current = {}
+        for entry in faq_contexts:
+            current[entry["id"]] = entry
+
+        added, updated, skipped = [], [], 0
+        for entry_id, entry in current.items():
+            known = self.entries.get(entry_id)
+            if known is None:
+                added.append(entry)
+            elif known != entry_fingerprint(entry):
+                updated.append(entry)
+            else:
+                skipped += 1
+        removed = [entry_id for entry_id in self.entries if entry_id not in current]
+        return added, updated, removed, skipped
+
+    def record_entries(self, faq_contexts: List[Dict]):
+        """Replaces the stored entries with the ones that are now in the collection"""
+        self.entries = {entry["id"]: entry_fingerprint(entry) for entry in faq_contexts}
+
+    def reset(self):
+        """Forgets the ingested entries, e.g. when the collection was dropped"""
+        self.entries = {}
+
+    def save(self):
+        data = {"collection": self.collection_name, "settings": self.settings, "files": self.files, "entries": self.entries}
+        self.path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
@@ -1,3 +1,8 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Iterator, Optional
+
 from .core import load_json, load_yaml, load_markdown, load_text, load_csv
 
 LOADERS = {
@@ -8,3 +13,25 @@ LOADERS = {
     ".txt": load_text,
     ".csv": load_csv,  
 }
+
+
+def list_files(directory: str) -> List[Path]:
+    """All files a loader is registered for, in the same order the serial loader visits them"""
+    return [path for path in Path(directory).rglob("*") if path.suffix.lower() in LOADERS]
+
+
+def load_file(path: Path) -> List[Dict]:
+    """Parses one file with the loader registered for its extension"""
+    path = Path(path)
+    return LOADERS[path.suffix.lower()](path)
+
+
+def iter_files_parallel(paths: List[Path], workers: Optional[int] = None, chunksize: int = 8) -> Iterator[List[Dict]]:
+    """
+    Parses the files in a process pool. Each worker gets `chunksize` files at a time to keep the
+    inter-process overhead low. The results come back in the order of `paths`, so the output is the
+    same as parsing them one after another.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(load_file, paths, chunksize=max(1, chunksize))
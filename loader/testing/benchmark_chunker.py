@@ -0,0 +1,45 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from loader import chucky, stream_chunks
+
+SENTENCE = "Python lists are mutable sequences and support slicing, appending and sorting in place. "
+
+
+def make_document(path: Path, size_mb: float, paragraph_sentences: int):
+    """Writes a synthetic Markdown file of about size_mb megabytes."""
+    paragraph = SENTENCE * paragraph_sentences
+    target = int(size_mb * 1024 * 1024)
+    with open(path, "w", encoding="utf-8") as f:
+        written, section = 0, 0
+        while written < target:
+            block = f"## Section {section}\n\n" + "\n\n".join([paragraph] * 10) + "\n\n"
+            f.write(block)
+            written += len(block)
+            section += 1
+
+
+def run(label: str, chunk_fn, path: Path, size_mb: float) -> dict:
+    start = time.perf_counter()
+    chunks = chunk_fn(path)
+    elapsed = time.perf_counter() - start
+    longest = max((len(chunk) for chunk in chunks), default=0)
+    print(f"{label:<14} {elapsed:8.3f}s  {size_mb / elapsed:8.1f} MB/s  {len(chunks):8d} chunks  longest chunk {longest} chars")
+    return {"seconds": elapsed, "chunks": len(chunks), "longest": longest}
+
+
+if __name__ == "__main__":
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as tmp:
+        for paragraph_sentences, description in ((3, "short paragraphs"), (2000, "huge paragraphs")):
+            path = Path(tmp) / "bench.md"
+            make_document(path, size_mb, paragraph_sentences)
+            print(f"\n{size_mb} MB of {description}:")
+            run("chucky", lambda p: chucky(p.read_text(encoding="utf-8")), path, size_mb)
+            run("stream_chunks", lambda p: list(stream_chunks(p, max_chars=500)), path, size_mb)
+            run("  +overlap/hd", lambda p: list(stream_chunks(p, max_chars=500, overlap=50, heading_context=True)), path, size_mb)
@@ -0,0 +1,78 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from loader import chucky, chunk_text
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+def words_with_special_tokens(text: str) -> int:
+    # Like a tokenizer call that adds [CLS] and [SEP]
+    return len(text.split()) + 2
+
+
+def paragraphs(count: int, size: int) -> str:
+    return "\n\n".join(" ".join(f"w{p}_{i}" for i in range(size)) for p in range(count))
+
+
+def test_token_mode_fills_chunks():
+    # 3-word paragraphs under a 10-token limit: 3 per chunk, separators are not tokens
+    chunks = chunk_text(paragraphs(7, 3), max_tokens=10, count_tokens=words)
+    assert [words(chunk) for chunk in chunks] == [9, 9, 3]
+
+
+def test_token_mode_counts_special_tokens_once():
+    chunks = chunk_text(paragraphs(8, 2), max_tokens=10, count_tokens=words_with_special_tokens)
+    assert [words(chunk) for chunk in chunks] == [8, 8]
+
+
+def test_token_mode_splits_long_paragraph_between_words():
+    chunks = chunk_text(paragraphs(1, 25), max_tokens=10, count_tokens=words)
+    assert [words(chunk) for chunk in chunks] == [10, 10, 5]
+
+
+def test_token_mode_paragraph_at_limit_is_not_split():
+    chunks = chunk_text(paragraphs(2, 10), max_tokens=10, count_tokens=words)
+    assert [words(chunk) for chunk in chunks] == [10, 10]
+
+
+@pytest.mark.parametrize("size", [499, 500])
+def test_char_mode_paragraph_at_limit_is_not_split(size):
+    text = "a" * size + "\n\n" + "b" * 10
+    assert chunk_text(text, max_chars=500) == chucky(text, 500) == ["a" * size, "b" * 10]
+
+
+def test_char_mode_matches_chucky():
+    rng = random.Random(0)
+    for _ in range(200):
+        text = "\n\n".join("x" * rng.randint(0, 500) for _ in range(rng.randint(1, 30)))
+        assert chunk_text(text, max_chars=500) == [chunk for chunk in chucky(text, 500) if chunk]
+
+
+def test_heading_context_on_first_chunk():
+    text = "# Lists\n\n## Slicing\n\n" + paragraphs(6, 3)
+    chunks = chunk_text(text, max_tokens=12, count_tokens=words, heading_context=True)
+    # Every chunk gets the headings it starts under, the first one too
+    assert chunks[0].startswith("Lists\n\n# Lists\n\n## Slicing")
+    assert len(chunks) > 1
+    assert all(chunk.startswith("Lists > Slicing\n\n") for chunk in chunks[1:])
+
+
+@pytest.mark.parametrize("overlap", [0, 3])
+def test_chunks_stay_under_token_limit(overlap):
+    rng = random.Random(1)
+    text = "\n\n".join(
+        (f"{'#' * rng.randint(1, 3)} heading {p}" if rng.random() < 0.2 else paragraphs(1, rng.randint(1, 30)))
+        for p in range(200)
+    )
+    for count_tokens in (words, words_with_special_tokens):
+        chunks = chunk_text(text, max_tokens=16, count_tokens=count_tokens, overlap=overlap, heading_context=True)
+        assert chunks
+        assert max(count_tokens(chunk) for chunk in chunks) <= 16
@@ -0,0 +1,71 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from loader import IngestionManifest
+from loader.loaders import LOADERS
+
+
+def entry(entry_id: str, content: str) -> dict:
+    return {"id": entry_id, "content": content, "source": "faq.json"}
+
+
+def test_diff_added_updated_removed_unchanged(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"), collection_name="faq")
+    first = [entry("a", "A"), entry("b", "B"), entry("c", "C")]
+    assert manifest.diff(first) == (first, [], [], 0)
+    manifest.record_entries(first)
+
+    second = [entry("a", "A"), entry("b", "B changed"), entry("d", "D")]
+    added, updated, removed, skipped = manifest.diff(second)
+    assert [e["id"] for e in added] == ["d"]
+    assert [e["id"] for e in updated] == ["b"]
+    assert removed == ["c"]
+    assert skipped == 1
+
+
+def test_duplicate_ids_keep_the_last_entry(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    added, _, _, _ = manifest.diff([entry("a", "old"), entry("a", "new")])
+    assert [e["content"] for e in added] == ["new"]
+
+
+def test_saved_manifest_is_only_reused_for_its_collection(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = IngestionManifest(path, collection_name="faq")
+    manifest.record_entries([entry("a", "A")])
+    manifest.save()
+    assert IngestionManifest(path, collection_name="faq").diff([entry("a", "A")]) == ([], [], [], 1)
+    assert IngestionManifest(path, collection_name="other").entries == {}
+
+
+def test_files_changed_follows_the_loader_registry(tmp_path):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "faq.json").write_text(json.dumps([{"question": "Q", "answer": "A"}]), encoding="utf-8")
+    (kb / "notes.rst").write_text("no loader for this", encoding="utf-8")
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    manifest.track_files(str(kb))
+    manifest.record_entries([entry("a", "A")])
+    # Every extension with a loader is tracked, nothing else
+    assert set(manifest.files) == {"faq.json"}
+    assert all(Path(name).suffix in LOADERS for name in manifest.files)
+    assert not manifest.files_changed(str(kb))
+
+    (kb / "notes.rst").write_text("still no loader", encoding="utf-8")
+    assert not manifest.files_changed(str(kb))
+    (kb / "more.yml").write_text("- question: Q\n  answer: A\n", encoding="utf-8")
+    assert manifest.files_changed(str(kb))
+
+
+def test_changed_settings_are_detected(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = IngestionManifest(path, collection_name="faq", settings={"dedupe": "merge", "dedupe_threshold": 0.85})
+    # Nothing saved yet (or saved before settings were recorded) counts as changed
+    assert manifest.settings_changed()
+    manifest.record_entries([entry("a", "A")])
+    manifest.save()
+    assert not IngestionManifest(path, collection_name="faq", settings={"dedupe": "merge", "dedupe_threshold": 0.85}).settings_changed()
+    assert IngestionManifest(path, collection_name="faq", settings={"dedupe": "off"}).settings_changed()
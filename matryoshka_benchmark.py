@@ -0,0 +1,115 @@
+"""
+Memory, latency and recall of Matryoshka-truncated vectors on the knowledge base.
+
+Embeds the knowledge base once (full dimension, through the embedding cache), then for every
+stored dimension compares against full-dimension search:
+- memory of the stored float32 vectors
+- single-stage: top-k on the truncated vectors
+- two-stage: top (k * candidates) on the truncated vectors, rescored with the full vectors
+reporting recall@k and the mean/p95 search latency (brute force in NumPy, like the numpy backend).
+The queries are the questions of the Q&A entries, or the first sentence of the other entries.
+
+    python matryoshka_benchmark.py --dims 128,256,512 --top-k 5 --candidates 4
+    python matryoshka_benchmark.py --embedder stub   # offline, only checks the mechanics
+"""
+import argparse
+import json
+import re
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from loader import iter_allFiles
+from newRag import FAQEngine, reduce_dimension
+
+
+def queries_for(entries: List[Dict]) -> List[str]:
+    queries = []
+    for entry in entries:
+        question = entry.get("question") or re.split(r"(?<=[.!?:])\s", entry["content"], maxsplit=1)[0]
+        if question.strip():
+            queries.append(question.strip())
+    return queries
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def timed_search(queries, search) -> Tuple[List[np.ndarray], List[float]]:
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def recall(results: List[np.ndarray], truth: np.ndarray) -> float:
+    return float(np.mean([len(set(found.tolist()) & set(expected.tolist())) / len(expected) for found, expected in zip(results, truth)]))
+
+
+def summary(latencies: List[float]) -> Dict[str, float]:
+    values = np.array(latencies) * 1000
+    return {"mean_ms": float(values.mean()), "p95_ms": float(np.percentile(values, 95))}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Matryoshka dimension vs recall/latency/memory.")
+    parser.add_argument("--knowledge-base", default="./knowledgebase")
+    parser.add_argument("--embedder", choices=("hf", "stub"), default="hf")
+    parser.add_argument("--dims", default="64,128,256,512")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=4, help="first-stage hits per result in two-stage mode")
+    parser.add_argument("--no-layer-norm", action="store_true", help="plain truncation (non-nomic models)")
+    parser.add_argument("--output", default="matryoshka_results.json")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    embed_model, cache_dir = None, "./embedding_cache"
+    if args.embedder == "stub":
+        from benchmark import StubEmbedding
+        embed_model, cache_dir = StubEmbedding(768), None
+    engine = FAQEngine(qdrant_url=":memory:", collection_name="matryoshka_benchmark", embedding_cache_dir=cache_dir,
+                       lexical_index_dir=None, embed_model=embed_model)
+
+    entries = list(iter_allFiles(args.knowledge_base))
+    documents = np.asarray(engine.embed_documents([entry["content"] for entry in entries]), dtype=np.float32)
+    queries = np.asarray(engine.embed_queries(queries_for(entries)), dtype=np.float32)
+    k = min(args.top_k, len(documents))
+    layer_norm = not args.no_layer_norm
+    print(f"{len(documents)} documents, {len(queries)} queries, model dimension {documents.shape[1]}, recall@{k}")
+
+    truth = top_k(queries @ documents.T, k)
+    _, full_latencies = timed_search(queries, lambda query: top_k((documents @ query)[None, :], k)[0])
+    rows = [{"dim": documents.shape[1], "mode": "full", "bytes": documents.nbytes, "recall": 1.0, **summary(full_latencies)}]
+
+    for dim in [int(dim) for dim in args.dims.split(",") if dim and int(dim) < documents.shape[1]]:
+        reduced = np.ascontiguousarray(reduce_dimension(documents, dim, layer_norm))
+        reduced_queries = reduce_dimension(queries, dim, layer_norm)
+
+        single, latencies = timed_search(reduced_queries, lambda query: top_k((reduced @ query)[None, :], k)[0])
+        rows.append({"dim": dim, "mode": "truncated", "bytes": reduced.nbytes, "recall": recall(single, truth), **summary(latencies)})
+
+        def two_stage(pair):
+            short, full = pair
+            candidates = top_k((reduced @ short)[None, :], k * args.candidates)[0]
+            rescored = documents[candidates] @ full
+            return candidates[np.argsort(-rescored)[:k]]
+
+        rescored, latencies = timed_search(list(zip(reduced_queries, queries)), two_stage)
+        # the full vectors are read from the embedding cache (disk, memory-mapped), not kept in the index
+        rows.append({"dim": dim, "mode": f"rescore x{args.candidates}", "bytes": reduced.nbytes, "recall": recall(rescored, truth), **summary(latencies)})
+
+    print(f"{'dim':>5} {'mode':>12} {'index MB':>9} {'recall':>7} {'mean ms':>8} {'p95 ms':>8}")
+    for row in rows:
+        print(f"{row['dim']:>5} {row['mode']:>12} {row['bytes'] / 1e6:9.3f} {row['recall']:7.3f} {row['mean_ms']:8.3f} {row['p95_ms']:8.3f}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"documents": len(documents), "queries": len(queries), "top_k": k, "config": vars(args), "results": rows}, f, indent=2)
+    print(f"Results written to {args.output}")
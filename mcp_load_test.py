@@ -0,0 +1,123 @@
+"""
+End-to-end load test of a running MCP server (python mcp_server.py) through one persistent session.
+
+Replays the queries of --queries against python_faq_retrieval_tool at --rate requests/sec (open loop:
+requests are sent on schedule whether or not earlier ones have returned, at most --concurrency in flight)
+and reports the achieved throughput and the latency percentiles. Latency is measured from the time a
+request was due, so time spent waiting for a free slot counts (a slow server can't hide behind a lower rate).
+The query file is one query per line (.txt), a JSON list, or JSON lines with a "query" or "question" field.
+
+    python mcp_load_test.py --queries queries.txt --rate 20 --requests 1000 --concurrency 16
+    python mcp_load_test.py --queries queries.txt --rate 0   # as fast as --concurrency allows
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from simpleMCPClient import SERVER_URL, MCPSession
+
+
+def load_queries(path: str) -> List[str]:
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        items = json.loads(text)
+    elif path.endswith(".jsonl"):
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        items = text.splitlines()
+    queries = [item if isinstance(item, str) else item.get("query") or item.get("question") or "" for item in items]
+    queries = [query.strip() for query in queries if query and query.strip()]
+    if not queries:
+        raise ValueError(f"No queries in {path}.")
+    return queries
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    return {
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+async def replay(session: MCPSession, tool: str, calls: List[Dict[str, Any]], rate: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def one(args: Dict[str, Any], due: float):
+        try:
+            result = await session.call(tool, args)
+            if getattr(result, "is_error", False):
+                raise RuntimeError("tool error")
+            latencies.append(time.perf_counter() - due)
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    start = time.perf_counter()
+    tasks = []
+    for i, args in enumerate(calls):
+        due = start + i / rate if rate > 0 else time.perf_counter()
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(args, due)))
+    await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - start
+    return {
+        "requests": len(calls),
+        "ok": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "offered_rate": rate or None,
+        "throughput": round(len(latencies) / seconds, 2),
+        **percentiles(latencies),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a query file against the MCP server and report throughput and latency.")
+    parser.add_argument("--url", default=SERVER_URL)
+    parser.add_argument("--queries", required=True, help="query file (.txt, .json or .jsonl)")
+    parser.add_argument("--tool", default="python_faq_retrieval_tool")
+    parser.add_argument("--collection", default=None)
+    parser.add_argument("--rate", type=float, default=10.0, help="requests/sec, 0 sends them as fast as --concurrency allows")
+    parser.add_argument("--requests", type=int, default=0, help="number of requests, the query file is cycled (default: every query once)")
+    parser.add_argument("--concurrency", type=int, default=16, help="max requests in flight")
+    parser.add_argument("--warmup", type=int, default=5, help="requests sent (and not measured) before the run")
+    parser.add_argument("--output", default="mcp_load_results.json")
+    return parser.parse_args()
+
+
+async def main(args):
+    queries = load_queries(args.queries)
+    count = args.requests or len(queries)
+    extra = {"collection": args.collection} if args.collection else {}
+    calls = [{"query": queries[i % len(queries)], **extra} for i in range(count)]
+    async with MCPSession(args.url, max_concurrency=args.concurrency) as session:
+        if args.warmup:
+            await session.call_many([(args.tool, call) for call in calls[:args.warmup]])
+        print(f"{count} requests ({len(queries)} distinct queries) to {args.tool} at "
+              f"{args.rate or 'max'} req/s, concurrency {args.concurrency}...")
+        return await replay(session, args.tool, calls, args.rate)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = asyncio.run(main(args))
+    print(json.dumps(result, indent=2))
+    if args.rate and result["throughput"] < 0.9 * args.rate:
+        print(f"The server kept up with only {result['throughput']} of {args.rate} req/s.")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "results": result}, f, indent=2)
+    print(f"Results written to {args.output}")
@@ -1,155 +1,504 @@
 import os
-import json
-from typing import List, Dict, Any
-import requests
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 
+import yaml
+# typing.TypedDict can't describe a tool's output schema before Python 3.12 (pydantic needs this one)
+from typing_extensions import NotRequired, TypedDict
 from dotenv import load_dotenv  # install python-dotenv
 # from mcp.server.fastmcp import FastMCP  # install mcp-server
 from fastmcp import FastMCP
-from newRag import FAQEngine
-from loader import load_allFiles
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from loader import load_allFiles, IngestionManifest
+from web_search import FirecrawlClient, SearchError, format_results
+from telemetry import REGISTRY, CACHE_SIZE, TOOL_ERRORS, SAMPLED, configure_logging, get_logger, track_tool
+# newRag (llama_index, torch, qdrant) is imported by start_engine(), so the server can bind right away
 
 load_dotenv()
+# LOG_LEVEL (default INFO) and LOG_SAMPLE_RATE (share of the per-request debug records that are written)
+configure_logging()
+logger = get_logger("server")
 
 QDRANT_URL = "http://localhost:6333"
 # Using a new collection for the Python data
 COLLECTION_NAME = "python_faq_collection"
+KNOWLEDGE_BASE_DIR = "./knowledgebase"
+# Several knowledge bases can be served by this one process (one embedding model, one Qdrant connection):
+# COLLECTIONS_CONFIG is a YAML file naming them, see collections.example.yaml. Without it the server hosts
+# COLLECTION_NAME with the files of KNOWLEDGE_BASE_DIR.
+COLLECTIONS_CONFIG = os.getenv("COLLECTIONS_CONFIG")
+# "qdrant" uses the Qdrant server, "numpy" keeps the vectors in this process (saved under VECTOR_STORE_PATH)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+VECTOR_STORE_PATH = "./vector_store"
+# float32, float16 or int8 (numpy backend only)
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+# "dense", "hybrid" (BM25 + dense with rank fusion, keyword queries skip the model) or "lexical"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")
+# Minimum BM25 score of a lexical hit, weaker ones (only common words in common) are not fused into the results
+LEXICAL_MIN_SCORE = float(os.getenv("LEXICAL_MIN_SCORE", "1.5"))
+# Qdrant collection tuning (applied when the collection is created, except QDRANT_HNSW_EF/QDRANT_EXACT_SEARCH).
+# Use `python hnsw_sweep.py` to pick values for the corpus size.
+QDRANT_OPTIONS = {
+    "hnsw_m": int(os.getenv("QDRANT_HNSW_M")) if os.getenv("QDRANT_HNSW_M") else None,
+    "hnsw_ef_construct": int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT")) if os.getenv("QDRANT_HNSW_EF_CONSTRUCT") else None,
+    "quantization": os.getenv("QDRANT_QUANTIZATION") or None,  # "scalar" or "binary"
+    "on_disk": os.getenv("QDRANT_ON_DISK", "0") == "1",
+    "on_disk_payload": os.getenv("QDRANT_ON_DISK_PAYLOAD", "0") == "1",
+    "indexing_threshold": int(os.getenv("QDRANT_INDEXING_THRESHOLD", "20000")),
+    "hnsw_ef": int(os.getenv("QDRANT_HNSW_EF")) if os.getenv("QDRANT_HNSW_EF") else None,
+    "exact": os.getenv("QDRANT_EXACT_SEARCH", "0") == "1",
+}
+# Stored vector dimension (Matryoshka truncation of the 768 model dimensions, e.g. 256), empty keeps all.
+# RESCORE_CANDIDATES > 0 searches that many candidates per result on the short vectors and rescores them
+# with the full vectors of the embedding cache. Changing VECTOR_DIM needs a new collection: with
+# RECREATE_ON_DIM_CHANGE=1 a collection of the wrong size is recreated at startup, with 0 the startup fails.
+VECTOR_DIM = int(os.getenv("VECTOR_DIM")) if os.getenv("VECTOR_DIM") else None
+RECREATE_ON_DIM_CHANGE = os.getenv("RECREATE_ON_DIM_CHANGE", "1") == "1"
+RESCORE_CANDIDATES = int(os.getenv("RESCORE_CANDIDATES", "0"))
+# Documents are embedded in batches of similar length with at most this many (padded) tokens, 0 keeps file order
+EMBED_TOKEN_BUDGET = int(os.getenv("EMBED_TOKEN_BUDGET", "8192"))
+# Embedding backend: "hf" (PyTorch fp32) or "onnx" (ONNX Runtime, export it first with `python export_onnx.py`)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "hf")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./onnx_model")
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "1") != "0"
+# Threads of one model call, empty uses all cores
+EMBED_THREADS = int(os.getenv("EMBED_THREADS")) if os.getenv("EMBED_THREADS") else None
+# Store only content and source in the payload (question and answer are part of content already).
+# Applies to newly ingested entries, delete the collection to rewrite existing ones.
+SLIM_PAYLOAD = os.getenv("SLIM_PAYLOAD", "1") != "0"
+# Recent query vectors whose results are reused for paraphrases (cosine >= SEMANTIC_CACHE_THRESHOLD), size 0 disables
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "256"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Near-duplicate entries are removed before embedding: "merge" (keeps all their sources), "drop" or "off".
+# Changing it re-ingests the collection on the next start.
+DEDUPE = os.getenv("DEDUPE", "off")
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.85"))
+# Remembers what was already ingested so restarts only embed new or changed entries (one file per collection)
+MANIFEST_PATH = "./ingestion_manifest.json"
+# Number of processes used to parse the knowledge base files, 0 parses them one after another
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "0"))
+# Retrieval queries processed at the same time, the rest wait in line
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "8"))
+# Threads running the query embedding model
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "2"))
+# Concurrent queries arriving within this window (or until the batch is full) are embedded in one model call
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "32"))
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "5"))
+# Bind the server first and load the model / ingest in the background (set WARM_START=0 to do it before binding)
+WARM_START = os.getenv("WARM_START", "1") != "0"
+# Firecrawl web search. The base URL can point to a local stand-in server for testing.
+FIRECRAWL_BASE_URL = os.getenv("FIRECRAWL_BASE_URL", "https://api.firecrawl.dev")
+WEB_SEARCH_CONNECT_TIMEOUT = float(os.getenv("WEB_SEARCH_CONNECT_TIMEOUT", "5"))
+WEB_SEARCH_READ_TIMEOUT = float(os.getenv("WEB_SEARCH_READ_TIMEOUT", "30"))
+MAX_CONCURRENT_WEB_SEARCHES = int(os.getenv("MAX_CONCURRENT_WEB_SEARCHES", "4"))
+# Seconds a search result is reused for the same (normalized) query, 0 disables the cache
+WEB_SEARCH_CACHE_TTL = float(os.getenv("WEB_SEARCH_CACHE_TTL", "600"))
+# Upper limit for the text returned by the web search tool in compact mode
+WEB_SEARCH_MAX_CHARS = int(os.getenv("WEB_SEARCH_MAX_CHARS", "4000"))
 HOST = "127.0.0.1"
 PORT = 8000
 
+
+
+def load_collections() -> Dict[str, Dict[str, Any]]:
+    """
+    Collection name -> settings: knowledge_base (required), description, retrieval_mode and dedupe
+    (both default to RETRIEVAL_MODE / DEDUPE). The first collection is the default one.
+    """
+    if not COLLECTIONS_CONFIG:
+        return {COLLECTION_NAME: {"knowledge_base": KNOWLEDGE_BASE_DIR, "description": "General Python programming concepts."}}
+    with open(COLLECTIONS_CONFIG, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    collections = {}
+    for name, settings in (config.get("collections") or {}).items():
+        settings = dict(settings or {})
+        if not settings.get("knowledge_base"):
+            raise ValueError(f"Collection '{name}' in {COLLECTIONS_CONFIG} has no knowledge_base.")
+        collections[name] = settings
+    if not collections:
+        raise ValueError(f"{COLLECTIONS_CONFIG} defines no collections.")
+    return collections
+
+
+def manifest_path(collection: str) -> str:
+    # The original single collection keeps its manifest file, so upgrading doesn't re-ingest it
+    return MANIFEST_PATH if collection == COLLECTION_NAME else f"./ingestion_manifest.{collection}.json"
+
+
+def entries_dump_path(collection: str) -> str:
+    # The loaded entries are written out for inspection, one file per collection
+    return "./all_entries.json" if collection == COLLECTION_NAME else f"./all_entries.{collection}.json"
+
+
+COLLECTIONS = load_collections()
+DEFAULT_COLLECTION = next(iter(COLLECTIONS))
+
 # create an MCP server instance
 mcp_server = FastMCP('MCP-RAG-app', host=HOST, port=PORT)
 
+# Set by start_engine(). engine_status is the model/startup, every collection has its own status
+# and is served as soon as its own ingestion is done.
+faq_engines: Dict[str, Any] = {}
+async_faq_engines: Dict[str, Any] = {}
+engine_status = {"status": "starting", "error": None}
+collection_status = {name: {"status": "starting", "error": None} for name in COLLECTIONS}
+search_client = None
+
+
+def start_engine():
+    """Loads the embedding model once, then ingests every collection and marks each one ready on its own."""
+    try:
+        engine_status["status"] = "loading"
+        for status in collection_status.values():
+            status["status"] = "loading"
+        from newRag import FAQEngine
+
+        # Initialize the FAQEngine once to avoid repeated setup, the other collections share its model and connection
+        base_engine = FAQEngine(
+            qdrant_url=QDRANT_URL,
+            collection_name=DEFAULT_COLLECTION,
+            vector_backend=VECTOR_BACKEND,
+            vector_store_path=VECTOR_STORE_PATH,
+            vector_store_dtype=VECTOR_STORE_DTYPE,
+            retrieval_mode=COLLECTIONS[DEFAULT_COLLECTION].get("retrieval_mode", RETRIEVAL_MODE),
+            lexical_min_score=LEXICAL_MIN_SCORE,
+            qdrant_options=QDRANT_OPTIONS,
+            vector_dim=VECTOR_DIM,
+            rescore_candidates=RESCORE_CANDIDATES,
+            embed_token_budget=EMBED_TOKEN_BUDGET or None,
+            embed_backend=EMBED_BACKEND,
+            onnx_model_dir=ONNX_MODEL_DIR,
+            onnx_quantized=ONNX_QUANTIZED,
+            embed_threads=EMBED_THREADS,
+            slim_payload=SLIM_PAYLOAD,
+            semantic_cache_size=SEMANTIC_CACHE_SIZE,
+            semantic_cache_threshold=SEMANTIC_CACHE_THRESHOLD,
+        )
+    except Exception as e:
+        engine_status["status"] = "failed"
+        engine_status["error"] = str(e)
+        for status in collection_status.values():
+            status.update(status="failed", error=str(e))
+        logger.exception(f"FAQ engine failed to start: {e}")
+        return
+
+    engine_status["status"] = "ingesting"
+    # Every collection has its own manifest, so an unchanged one is skipped and a failing one doesn't stop the rest
+    for name, settings in COLLECTIONS.items():
+        engine = base_engine if name == DEFAULT_COLLECTION else base_engine.for_collection(name, settings.get("retrieval_mode", RETRIEVAL_MODE))
+        ingest_collection(engine, settings)
+
+    failed = [name for name, status in collection_status.items() if status["status"] == "failed"]
+    if len(failed) == len(COLLECTIONS):
+        engine_status.update(status="failed", error="No collection could be ingested.")
+    else:
+        engine_status.update(status="ready", error=f"Failed collections: {', '.join(failed)}" if failed else None)
+    logger.info(f"FAQ engine is ready. Collections: {', '.join(name for name in faq_engines)}")
+
+
+def ingest_collection(engine, settings: Dict[str, Any]):
+    """Ingests one collection's knowledge base (only what changed since the last run) and starts serving it."""
+    name = engine.collection_name
+    directory = settings["knowledge_base"]
+    dedupe = settings.get("dedupe", DEDUPE)
+    try:
+        collection_status[name]["status"] = "ingesting"
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"Knowledge base folder '{directory}' does not exist.")
+        # Setup the collection and ingest data if not already done
+        # faq_engine.setup_collection(FAQEngine.parse_faq(PYTHON_FAQ_TEXT)) // an example to deal  with raw text
+        # The dedupe settings decide which entries are stored, so changing them has to go through the entries again
+        ingest_settings = {"dedupe": dedupe}
+        if dedupe != "off":
+            ingest_settings["dedupe_threshold"] = DEDUPE_THRESHOLD
+        manifest = IngestionManifest(manifest_path(name), collection_name=name, settings=ingest_settings)
+        # A collection of another vector size (VECTOR_DIM changed) goes through setup_collection, which recreates it or fails
+        if (engine.vector_store.dimension() == engine.vector_dim and not manifest.settings_changed()
+                and not manifest.files_changed(directory)):
+            logger.info(f"Knowledge base of '{name}' unchanged since last ingestion. Skipping ingestion.")
+        else:
+            faq_contexts=load_allFiles(directory, workers=LOAD_WORKERS, dump_path=entries_dump_path(name))
+            manifest.track_files(directory)
+            engine.setup_collection(
+                faq_contexts,
+                manifest=manifest,
+                dedupe=None if dedupe == "off" else dedupe,
+                dedupe_threshold=DEDUPE_THRESHOLD,
+                recreate_on_dim_change=RECREATE_ON_DIM_CHANGE,
+            )
+        faq_engines[name] = engine
+        collection_status[name]["status"] = "ready"
+        logger.info(f"Collection '{name}' is ready.")
+    except Exception as e:
+        collection_status[name].update(status="failed", error=str(e))
+        logger.exception(f"Ingestion of collection '{name}' failed: {e}")
+
+
+def get_search_client():
+    """The Firecrawl client (and its connection pool) is shared by all web searches."""
+    global search_client
+    if search_client is None:
+        api_key = os.getenv('FIRECRAWL_API_KEY')
+        if not api_key:
+            return None
+        search_client = FirecrawlClient(
+            api_key,
+            base_url=FIRECRAWL_BASE_URL,
+            connect_timeout=WEB_SEARCH_CONNECT_TIMEOUT,
+            read_timeout=WEB_SEARCH_READ_TIMEOUT,
+            max_concurrency=MAX_CONCURRENT_WEB_SEARCHES,
+            cache_ttl=WEB_SEARCH_CACHE_TTL,
+        )
+    return search_client
+
+
+def get_async_engine(collection: str):
+    """
+    The async engines are created on first use, inside the server's event loop. All collections share
+    the embedding threads, the micro-batcher and the MAX_CONCURRENT_QUERIES limit of the first one.
+    """
+    if collection not in async_faq_engines:
+        from newRag import AsyncFAQEngine
+
+        if async_faq_engines:
+            async_faq_engines[collection] = next(iter(async_faq_engines.values())).for_engine(faq_engines[collection])
+        else:
+            async_faq_engines[collection] = AsyncFAQEngine(
+                faq_engines[collection],
+                max_concurrency=MAX_CONCURRENT_QUERIES,
+                embed_workers=EMBED_WORKERS,
+                micro_batch_size=QUERY_BATCH_SIZE,
+                micro_batch_wait_ms=QUERY_BATCH_WAIT_MS,
+            )
+    return async_faq_engines[collection]
+
+
+def check_collection(collection: Optional[str]) -> Tuple[str, Optional[str]]:
+    """The collection a tool call goes to (the default one if not given), and why it can't be served right now, if so."""
+    name = collection or DEFAULT_COLLECTION
+    if name not in COLLECTIONS:
+        return name, f"Unknown collection '{name}'. Available collections: {', '.join(COLLECTIONS)}."
+    status = collection_status[name]["status"]
+    if status != "ready":
+        return name, f"The '{name}' knowledge base is not ready yet (status: {status}). Please try again shortly."
+    return name, None
+
+
+@mcp_server.custom_route("/health", methods=["GET"])
+async def health(request: Request) -> JSONResponse:
+    """Liveness: the process is up, whatever the engine is doing."""
+    return JSONResponse({**engine_status, "collections": collection_status})
+
+
+@mcp_server.custom_route("/ready", methods=["GET"])
+async def ready(request: Request) -> JSONResponse:
+    """Readiness: 200 once the knowledge bases can be queried, 503 while loading/ingesting (or failed)."""
+    return JSONResponse({**engine_status, "collections": collection_status}, status_code=200 if engine_status["status"] == "ready" else 503)
+
+
+@mcp_server.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> PlainTextResponse:
+    """Latency histograms and counters in the Prometheus text format."""
+    for name, engine in list(faq_engines.items()):
+        for cache, stats in engine.cache_stats().items():
+            CACHE_SIZE.set(stats["size"], cache=cache, collection=name)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@mcp_server.custom_route("/cache_stats", methods=["GET"])
+async def cache_stats(request: Request) -> JSONResponse:
+    """Size, hit rate and (semantic cache) lookup latency of every query cache, per collection."""
+    return JSONResponse({name: engine.cache_stats() for name, engine in list(faq_engines.items())})
+
+
+@mcp_server.tool()
+def health_tool() -> Dict[str, Any]:
+    """
+    Report whether the knowledge bases are ready to be queried.
+
+    Returns:
+        dict: {"status": "starting" | "loading" | "ingesting" | "ready" | "failed", "error": str | None,
+               "collections": {name: {"status", "error"}}}
+    """
+    return {**engine_status, "collections": {name: dict(status) for name, status in collection_status.items()}}
+
+
+@mcp_server.tool()
+def list_collections_tool() -> List[Dict[str, Any]]:
+    """
+    List the knowledge base collections the retrieval tools can search, with what each one is about.
+    Pass the name as `collection` to python_faq_retrieval_tool / python_faq_batch_retrieval_tool.
+
+    Returns:
+        List[dict]: {"name", "description", "status", "default"} per collection.
+    """
+    return [
+        {
+            "name": name,
+            "description": settings.get("description", ""),
+            "status": collection_status[name]["status"],
+            "default": name == DEFAULT_COLLECTION,
+        }
+        for name, settings in COLLECTIONS.items()
+    ]
+
+
+def check_top_k(top_k: Any):
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1:
+        raise ValueError("top_k must be a positive integer.")
+
+
 # A docstring in Python is a string literal that occurs as the first statement in a module, function, class, or method definition. It serves as a form of documentation, providing a concise summary of the object's purpose and how to use it.
 
 
 @mcp_server.tool()
-def python_faq_retrieval_tool(query: str) -> str:
+async def python_faq_retrieval_tool(query: str, collection: Optional[str] = None) -> str:
     """
     Retrieve the most relevant documents from the Python FAQ collection. 
     Use this tool when the user asks about general Python programming concepts.
 
     Args:
         query (str): The user query to retrieve the most relevant documents.
+        collection (str, optional): The knowledge base to search (see list_collections_tool), the default one if omitted.
 
     Returns:
         str: The most relevant documents retrieved from the vector DB.
     """
-    print("Received query for python_faq_retrieval_tool:", query)
-    if not isinstance(query, str):
-        raise TypeError("Query must be a string.")
+    logger.debug("Received query for python_faq_retrieval_tool: %s", query, extra=SAMPLED)
+    with track_tool("python_faq_retrieval_tool"):
+        if not isinstance(query, str):
+            raise TypeError("Query must be a string.")
+
+        collection, error = check_collection(collection)
+        if error:
+            TOOL_ERRORS.inc(tool="python_faq_retrieval_tool")
+            return error
+
+        # Use the pre-initialized async engine so the event loop keeps serving other calls meanwhile
+        return await get_async_engine(collection).answer_question(query)
+
+
+class SearchHit(TypedDict):
+    id: str
+    score: float
+    content: str
+    source: str
+
 
-    # Use the single, pre-initialized faq_engine instance for efficiency
-    return faq_engine.answer_question(query)
+class SearchResults(TypedDict):
+    query: str
+    score_type: NotRequired[str]
+    results: List[SearchHit]
+    error: NotRequired[str]
 
 
 @mcp_server.tool()
-def firecrawl_web_search_tool(query: str) -> str:
+async def python_faq_search_tool(query: str, top_k: int = 3, collection: Optional[str] = None) -> SearchResults:
+    """
+    Search the Python FAQ collection and get the matching documents as structured data instead of a
+    prose answer. Use this tool when you want to quote, compare or cite the retrieved documents.
+
+    Args:
+        query (str): The user query to retrieve the most relevant documents.
+        top_k (int): How many documents to return, at least 1.
+        collection (str, optional): The knowledge base to search (see list_collections_tool), the default one if omitted.
+
+    Returns:
+        dict: {"query", "score_type", "results": [{"id", "score", "content", "source"}]}, best first, plus "error" if the
+        search couldn't run. score_type says what the scores (rounded to 4 places) are: "cosine" (similarity, -1..1),
+        "rrf" (hybrid rank fusion, about 0.016 per matching method) or "bm25" (keyword score, unbounded).
+        Compare scores only within the same score_type.
+    """
+    with track_tool("python_faq_search_tool"):
+        if not isinstance(query, str):
+            raise TypeError("Query must be a string.")
+        check_top_k(top_k)
+        collection, error = check_collection(collection)
+        if error:
+            TOOL_ERRORS.inc(tool="python_faq_search_tool")
+            return {"query": query, "results": [], "error": error}
+
+        return await get_async_engine(collection).retrieve(query, top_k=top_k)
+
+
+@mcp_server.tool()
+async def python_faq_batch_retrieval_tool(queries: List[str], top_k: int = 3, collection: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Retrieve the most relevant documents from the Python FAQ collection for several questions at once.
+    Use this tool instead of calling python_faq_retrieval_tool repeatedly when the user's request
+    breaks down into several related Python sub-questions.
+
+    Args:
+        queries (List[str]): The questions, answered in the same order.
+        top_k (int): How many documents to retrieve per question, at least 1.
+        collection (str, optional): The knowledge base to search (see list_collections_tool), the default one if omitted.
+
+    Returns:
+        List[dict]: One item per question: {"query", "answer", "score_type", "results": [{"id", "score", "source"}]}.
+        The scores are rounded to 4 places; score_type is "cosine", "rrf" or "bm25" as in python_faq_search_tool.
+    """
+    with track_tool("python_faq_batch_retrieval_tool"):
+        if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+            raise TypeError("Queries must be a list of strings.")
+        check_top_k(top_k)
+        collection, error = check_collection(collection)
+        if error:
+            TOOL_ERRORS.inc(tool="python_faq_batch_retrieval_tool")
+            return [{"query": query, "answer": error, "results": []} for query in queries]
+
+        return await get_async_engine(collection).answer_questions(queries, top_k=top_k)
+
+
+@mcp_server.tool()
+async def firecrawl_web_search_tool(query: str, compact: bool = True) -> str:
     """
     Search for information on a given topic using Firecrawl.
     Use this tool when the user asks a specific question not related to the Python FAQ.
 
     Args:
         query (str): The user query to search for information.
+        compact (bool): Short summary of the top results with truncated fields (default).
+            Set to False to also get the full results as a JSON string.
 
     Returns:
-        str: A human-readable string summary for the LLM (includes a short
-        top-results summary and the full results as a JSON string). Errors are
+        str: A human-readable string summary for the LLM. Errors are
         returned as an error string.
     """
-    if not isinstance(query, str):
-        raise TypeError("Query must be a string.")
-
-    url = "https://api.firecrawl.dev/v1/search"
-    api_key = os.getenv('FIRECRAWL_API_KEY')
+    with track_tool("firecrawl_web_search_tool"):
+        if not isinstance(query, str):
+            raise TypeError("Query must be a string.")
 
-    if not api_key:
-        return "Error: FIRECRAWL_API_KEY environment variable is not set."
+        client = get_search_client()
+        if client is None:
+            TOOL_ERRORS.inc(tool="firecrawl_web_search_tool")
+            return "Error: FIRECRAWL_API_KEY environment variable is not set."
 
-    payload = {"query": query, "timeout": 60000}
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-
-        # Prefer the 'data' key but fall back to other shapes.
-        raw = response.json()
-        data = None
-        if isinstance(raw, dict):
-            # common pattern: { "data": [...] }
-            data = raw.get("data", raw.get("results", None))
-        else:
-            data = raw
-
-        # Normalize different response shapes into List[dict]
-        normalized: List[Dict[str, Any]] = []
-        if isinstance(data, dict):
-            normalized = [data]
-        elif isinstance(data, list):
-            for item in data:
-                if isinstance(item, dict):
-                    normalized.append(item)
-                else:
-                    normalized.append({"result": item})
-        else:
-            normalized = [{"result": data}]
-
-        # If the API returned an error shape, return a short error string
-        if len(normalized) == 1 and isinstance(normalized[0], dict) and "error" in normalized[0]:
-            return f"Error from Firecrawl API: {normalized[0].get('error')}"
-
-        # Build a human-readable summary plus full JSON for the LLM to consume
-        lines = []
-        lines.append(f"Found {len(normalized)} results for query: {query}")
-
-        # Add brief top results (title/url/snippet) — try common keys
-        for idx, item in enumerate(normalized[:5], start=1):
-            title = item.get("title") or item.get("name") or item.get("headline") or item.get("result")
-            url_item = item.get("url") or item.get("link") or item.get("uri")
-            desc = item.get("description") or item.get("snippet") or item.get("summary") or ""
-            brief = f"{idx}. {title or '(no title)'}"
-            if url_item:
-                brief += f" — {url_item}"
-            if desc:
-                brief += f"\n   {desc}"
-            lines.append(brief)
-
-        # Add a separator and the full JSON results for downstream parsing if needed
         try:
-            full_json = json.dumps(normalized, indent=2, ensure_ascii=False)
-        except Exception:
-            full_json = str(normalized)
+            # The blocking HTTP call runs in a worker thread, bounded by the client's timeouts and concurrency cap
+            results = await asyncio.to_thread(client.search, query)
+        except SearchError as e:
+            TOOL_ERRORS.inc(tool="firecrawl_web_search_tool")
+            logger.warning(str(e))
+            return str(e)
 
-        lines.append("")
-        lines.append("Full results (JSON):")
-        lines.append(full_json)
-        
-        print("Formatted output:", "\n".join(lines))
-        return "\n".join(lines)
-    except requests.exceptions.RequestException as e:
-        return f"Error connecting to Firecrawl API: {e}"
+        text = format_results(query, results, compact=compact, max_chars=WEB_SEARCH_MAX_CHARS)
+        logger.debug(f"firecrawl_web_search_tool: {len(results)} results, {len(text)} chars", extra=SAMPLED)
+        return text
 
 
 if __name__ == "__main__":
-    # Initialize the FAQEngine once to avoid repeated setup
-    faq_engine = FAQEngine(
-        qdrant_url=QDRANT_URL,
-        collection_name=COLLECTION_NAME
-    )
-
-    # Setup the collection and ingest data if not already done
-    # faq_engine.setup_collection(FAQEngine.parse_faq(PYTHON_FAQ_TEXT)) // an example to deal  with raw text
-    faq_contexts=load_allFiles("./knowledgebase")
-    faq_engine.setup_collection(faq_contexts)
+    if WARM_START:
+        # The server binds immediately, /ready and health_tool report the progress
+        threading.Thread(target=start_engine, name="engine-startup", daemon=True).start()
+    else:
+        start_engine()
 
     # # Start the MCP server to listen for requests
-    print(f"Starting MCP server at http://{HOST}:{PORT}")
+    logger.info(f"Starting MCP server at http://{HOST}:{PORT}")
     try:
 
         mcp_server.run('http')  # Starts server at http://localhost:8000/mcp
     except Exception as e:
-        print(f"Server failed to start: {e}")
+        logger.error(f"Server failed to start: {e}")
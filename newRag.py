@@ -1,10 +1,40 @@
-from typing import List, Dict, Any, Generator
+from typing import List, Dict, Any, Generator, Optional, Deque, Iterable
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+import copy
 import hashlib
 import json
+import time
 
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+import numpy as np
 from tqdm import tqdm
-from qdrant_client import models, QdrantClient
+from qdrant_client import models
+
+from loader import IngestionManifest, deduplicate
+from embedding_store import EmbeddingStore
+from embed_scheduler import LengthBucketScheduler
+from embedders import make_embedder
+from caches import LRUCache, SemanticCache, normalize_query
+from ingest_pipeline import run_ingest_pipeline
+from query_batcher import QueryBatcher
+from vector_store import VectorStore, make_vector_store
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+from telemetry import (QUERY_STAGE_SECONDS, QUERIES, EMPTY_RESULTS, INGEST_STAGE_SECONDS, INGESTED_ENTRIES,
+                       SAMPLED, cache_lookup, get_logger)
+
+logger = get_logger("engine")
+
+RETRIEVAL_MODES = ("dense", "hybrid", "lexical")
+
+EMBED_MODEL_REVISION = "e5cf08aadaa33385f5990def41f7a23405aec398"
+
+# The payload fields a search reads back (answers, rescoring and fusion only need these). They are also
+# the whole payload in the slim schema: question and answer are already part of content.
+RESULT_FIELDS = ("content", "source")
+# What the score of a hit is, by query plan: cosine similarity (normalized vectors, DOT), the reciprocal rank
+# fusion score (about 1/60 per list a hit is in) or a BM25 score. Only scores of the same type compare.
+SCORE_TYPES = {"dense": "cosine", "hybrid": "rrf", "lexical": "bm25"}
 
 # Helper function for batching,the batch size here refer to the array size, not the actually string length
 def batch_generator(data: List[Any], batch_size: int) -> Generator[List[Any], None, None]:
@@ -12,6 +42,75 @@ def batch_generator(data: List[Any], batch_size: int) -> Generator[List[Any], No
     for i in range(0, len(data), batch_size):
         yield data[i : i + batch_size]
 
+def make_points(entries: List[Dict], embeddings: List[List[float]], payload_fields: Optional[Iterable[str]] = None) -> List[models.PointStruct]:
+    """Turns loader entries and their vectors into Qdrant points, with only payload_fields in the payload if given."""
+    points = []
+    for entry, vector in zip(entries, embeddings):
+        # Use a stable hash of the content as ID
+        entry_id = entry.get("id") or hashlib.md5(entry["content"].encode("utf-8")).hexdigest()
+        # Use the rest of the entry as payload (excluding id)
+        payload = {k: v for k, v in entry.items() if k != "id" and (payload_fields is None or k in payload_fields)}
+        points.append(models.PointStruct(id=entry_id, vector=vector, payload=payload))
+    return points
+
+
+def reduce_dimension(vectors: List[List[float]], dim: int, layer_norm: bool = True) -> np.ndarray:
+    """
+    Matryoshka truncation: keeps the first `dim` components and L2-normalizes them again, so the DOT
+    score is still the cosine similarity. nomic-embed-text-v1.5 applies a layer norm over the full
+    vector before truncating (layer_norm=True), other Matryoshka models just truncate.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if layer_norm:
+        matrix = (matrix - matrix.mean(axis=1, keepdims=True)) / np.sqrt(matrix.var(axis=1, keepdims=True) + 1e-5)
+    matrix = matrix[:, :dim]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class StreamingUploader:
+    """
+    Uploads points to the vector store while they are still being produced, instead of collecting everything first.
+    At most `parallel` upload requests are in flight (each of `batch_size` points), so memory stays O(batch).
+    The requests are sent without waiting for Qdrant to apply them; flush() sends the last batch with wait=True.
+    Qdrant applies the updates of a collection in order, so once flush() returns everything is searchable.
+    """
+    def __init__(self, store: VectorStore, batch_size: int = 256, parallel: int = 2):
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.parallel = max(1, parallel)
+        self.buffer: List[models.PointStruct] = []
+        self.in_flight: Deque[Future] = deque()
+        self.executor = ThreadPoolExecutor(max_workers=self.parallel)
+        self.uploaded = 0
+
+    def _upsert(self, points: List[models.PointStruct], wait: bool):
+        self.store.upsert(points, wait=wait)
+
+    def add(self, points: List[models.PointStruct]):
+        self.buffer.extend(points)
+        # Keep at least one point back, so flush() always has a batch to send with wait=True
+        while len(self.buffer) > self.batch_size:
+            batch, self.buffer = self.buffer[:self.batch_size], self.buffer[self.batch_size:]
+            if len(self.in_flight) >= self.parallel:
+                self.in_flight.popleft().result()  # backpressure: wait for the oldest upload
+            self.in_flight.append(self.executor.submit(self._upsert, batch, False))
+            self.uploaded += len(batch)
+
+    def flush(self) -> int:
+        """Waits for the pending uploads and sends the remaining points. Returns how many points were uploaded."""
+        try:
+            while self.in_flight:
+                self.in_flight.popleft().result()
+            if self.buffer:
+                self._upsert(self.buffer, wait=True)
+                self.uploaded += len(self.buffer)
+                self.buffer = []
+        finally:
+            self.executor.shutdown(wait=True)
+        return self.uploaded
+
+
 class FAQEngine:
     """
     An engine for setting up and querying a FAQ database using Qdrant and HuggingFace embeddings.
@@ -19,99 +118,643 @@ class FAQEngine:
     def __init__(self,
                  qdrant_url: str = "http://localhost:6333",
                  collection_name: str = "python-faq",
-                 embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5"): # this model is comingfrom nomic-ai, it is a good general purpose embedding model
+                 vector_backend: str = "qdrant",
+                 vector_store_path: str = "./vector_store",
+                 vector_store_dtype: str = "float32",
+                 embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5", # this model is comingfrom nomic-ai, it is a good general purpose embedding model
+                 embedding_cache_dir: Optional[str] = "./embedding_cache",
+                 embedding_cache_dtype: str = "float32",
+                 query_cache_size: int = 1024,
+                 query_cache_ttl: Optional[float] = 3600,
+                 lexical_index_dir: Optional[str] = "./lexical_index",
+                 retrieval_mode: str = "dense",
+                 hybrid_candidates: int = 4,
+                 lexical_min_score: float = 1.5,
+                 embed_model: Optional[Any] = None,
+                 qdrant_options: Optional[Dict[str, Any]] = None,
+                 vector_dim: Optional[int] = None,
+                 rescore_candidates: int = 0,
+                 matryoshka_layer_norm: bool = True,
+                 embed_token_budget: Optional[int] = 8192,
+                 embed_backend: str = "hf",
+                 onnx_model_dir: str = "./onnx_model",
+                 onnx_quantized: bool = True,
+                 embed_threads: Optional[int] = None,
+                 slim_payload: bool = False,
+                 semantic_cache_size: int = 256,
+                 semantic_cache_threshold: float = 0.95):
         
         self.collection_name = collection_name
         
-        # Initialize the embedding model
-        print("Loading embedding model...")
-        # HuggingFaceEmbedding  is a wrapping class like a loader, it doesn't provide model-it knows how to talk to Hugging Face Hub and download the model if not present locally
-        # Only when you pretty sure the custom model is safe, set trust_remote_code=True, otherwise it can be a security risk
-        self.embed_model = HuggingFaceEmbedding(
-            model_name=embed_model_name,
-            trust_remote_code=True,
-            revision="e5cf08aadaa33385f5990def41f7a23405aec398" # <-- Pin to a specific commit revision to avoid future breaking changes, without this it will always get the latest version, using "main" is to get the latest version (can be unstable
-        )
+        if embed_model is not None:
+            # A ready embedding model (e.g. the deterministic stub of benchmark.py), anything with
+            # get_text_embedding(), get_text_embedding_batch() and get_query_embedding()
+            self.embed_model = embed_model
+        else:
+            # Initialize the embedding model: "hf" is the PyTorch model through llama_index, "onnx" the
+            # (int8) ONNX Runtime export of the same revision made by export_onnx.py, see embedders.py
+            logger.info(f"Loading embedding model ({embed_backend})...")
+            self.embed_model = make_embedder(
+                embed_backend,
+                embed_model_name,
+                EMBED_MODEL_REVISION,
+                onnx_model_dir=onnx_model_dir,
+                onnx_quantized=onnx_quantized,
+                intra_op_threads=embed_threads,
+            )
+        text_prefix = getattr(self.embed_model, "text_instruction", None) or ""
         
-        # Dynamically get the vector dimension from the model
-        self.vector_dim = len(self.embed_model.get_text_embedding("test"))
-        print(f"Embedding model loaded. Vector dimension: {self.vector_dim}")
+        # Read the vector dimension from the model config instead of embedding a dummy text
+        self.model_dim = self._model_dimension()
+        # The collection can store shorter (Matryoshka-truncated) vectors, e.g. 256 of nomic's 768 dimensions.
+        # With rescore_candidates > 0 a search fetches rescore_candidates * limit hits on the short vectors
+        # and reorders them with the full vectors of the embedding cache.
+        if vector_dim is not None and not 0 < vector_dim <= self.model_dim:
+            raise ValueError(f"vector_dim must be between 1 and the model dimension {self.model_dim}.")
+        self.vector_dim = vector_dim or self.model_dim
+        self.matryoshka_layer_norm = matryoshka_layer_norm
+        self.rescore_candidates = rescore_candidates if self.vector_dim < self.model_dim else 0
+        if self.rescore_candidates and not embedding_cache_dir:
+            raise ValueError("rescore_candidates needs the embedding cache (embedding_cache_dir) for the full vectors.")
+        logger.info(f"Embedding model loaded. Vector dimension: {self.model_dim}, stored: {self.vector_dim}")
+
+        # Document batches are formed from texts of similar length under a token budget (padded tokens per
+        # model call) instead of a fixed count in file order, None embeds the batches as they come
+        self.embed_scheduler = None
+        if embed_token_budget:
+            self.embed_scheduler = LengthBucketScheduler(
+                max_tokens=embed_token_budget,
+                count_tokens=getattr(self.embed_model, "count_tokens", None),
+                max_length=getattr(self.embed_model, "max_length", None),
+                prefix=text_prefix,
+            )
+
+        # Document embeddings are cached on disk, so recreating or moving the collection doesn't need the model again.
+        # The cache always keeps the full vectors, so the stored dimension can change without re-embedding.
+        # Every backend has its own cache (the name), int8 vectors are close to the fp32 ones but not the same.
+        self.embedding_store = None
+        if embedding_cache_dir:
+            self.embedding_store = EmbeddingStore(
+                embedding_cache_dir,
+                model_name=getattr(self.embed_model, "name", None) or embed_model_name,
+                revision=EMBED_MODEL_REVISION,
+                task_prefix=text_prefix,
+                dim=self.model_dim,
+                dtype=embedding_cache_dtype,
+            )
+            logger.info(f"Embedding cache has {len(self.embedding_store)} vectors.")
+
+        # Agents keep asking the same questions: cache query vectors and the final answers.
+        # The answers are cleared whenever setup_collection() changes the collection.
+        self.query_embedding_cache = LRUCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        self.result_cache = LRUCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        # Paraphrases of recent queries: after embedding, a query whose vector is at least semantic_cache_threshold
+        # similar to an answered one reuses its hits and skips the vector search. Cleared with the answers.
+        self.semantic_cache = None
+        if semantic_cache_size > 0:
+            self.semantic_cache = SemanticCache(max_size=semantic_cache_size, threshold=semantic_cache_threshold, ttl=query_cache_ttl)
+
+        # BM25 index over the same entries, for hybrid (lexical + dense) and lexical-only retrieval
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval_mode}', use one of {RETRIEVAL_MODES}.")
+        self.retrieval_mode = retrieval_mode
+        self.hybrid_candidates = hybrid_candidates  # each side of the fusion returns top_k * hybrid_candidates
+        # BM25 floor, the lexical counterpart of score_threshold: hits that only share a common word with the
+        # query (a score around 1) don't reach the fusion or the keyword fast path
+        self.lexical_min_score = lexical_min_score
+        self.lexical_index_dir = lexical_index_dir
+        self.lexical_index = BM25Index(f"{lexical_index_dir}/{collection_name}.json") if lexical_index_dir else None
+
+        # Initialize the vector store: a Qdrant collection, or the in-process NumPy index
+        self.vector_store = make_vector_store(
+            vector_backend,
+            collection_name,
+            qdrant_url=qdrant_url,
+            path=vector_store_path,
+            dtype=vector_store_dtype,
+            # HNSW m/ef_construct, quantization, on-disk storage, hnsw_ef/exact search (see QdrantVectorStore)
+            qdrant_options=qdrant_options,
+            # Searches only transfer what the results need, never the vectors
+            payload_fields=RESULT_FIELDS,
+        )
+        # slim_payload stores only RESULT_FIELDS at ingestion instead of question + answer + content (which repeats both)
+        self.stored_payload_fields = RESULT_FIELDS if slim_payload else None
+        logger.info(f"Connected to the {vector_backend} vector store.")
+
+    def for_collection(self, collection_name: str, retrieval_mode: Optional[str] = None) -> "FAQEngine":
+        """
+        An engine for another collection that shares this one's embedding model, embedding cache, query
+        vector cache and vector store connection, so serving another knowledge base costs no extra model.
+        The collection, its lexical index and its answer caches are its own.
+        """
+        retrieval_mode = retrieval_mode or self.retrieval_mode
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval_mode}', use one of {RETRIEVAL_MODES}.")
+        engine = copy.copy(self)
+        engine.collection_name = collection_name
+        engine.retrieval_mode = retrieval_mode
+        engine.vector_store = self.vector_store.with_collection(collection_name)
+        engine.result_cache = LRUCache(max_size=self.result_cache.max_size, ttl=self.result_cache.ttl)
+        if self.semantic_cache is not None:
+            engine.semantic_cache = SemanticCache(max_size=self.semantic_cache.max_size, threshold=self.semantic_cache.threshold, ttl=self.semantic_cache.ttl)
+        engine.lexical_index = BM25Index(f"{self.lexical_index_dir}/{collection_name}.json") if self.lexical_index_dir else None
+        return engine
 
-        # Initialize the Qdrant client
-        self.client = QdrantClient(url=qdrant_url, prefer_grpc=True)
-        print("Connected to Qdrant.")
+    def _model_dimension(self) -> int:
+        """Vector dimension of the embedding model, taken from its config when available."""
+        dim = getattr(self.embed_model, "dim", None)
+        if not dim:
+            # Fall back to measuring it
+            dim = len(self.embed_model.get_text_embedding("test"))
+        return dim
 
-    def setup_collection(self, faq_contexts: List[Dict], batch_size: int = 64):
+    def collection_exists(self) -> bool:
+        """Returns True if the collection is already created in Qdrant."""
+        return self.vector_store.exists()
+
+    def setup_collection(self,
+                         faq_contexts: Iterable[Dict],
+                         batch_size: int = 64,
+                         manifest: Optional[IngestionManifest] = None,
+                         upload_batch_size: int = 256,
+                         upload_parallel: int = 2,
+                         pipelined: bool = False,
+                         queue_size: int = 4,
+                         dedupe: Optional[str] = None,
+                         dedupe_threshold: float = 0.85,
+                         recreate_on_dim_change: bool = False) -> Dict[str, Any]:
         """
         Creates a Qdrant collection (if it doesn't exist) and ingests the FAQ data.
+        Every embedded batch is uploaded right away (upload_batch_size points per request, upload_parallel
+        requests in flight), and the method only returns once the data is searchable.
+        When a manifest is given, only new or changed entries are embedded, points whose entries
+        disappeared are deleted and the manifest is saved afterwards.
+        With pipelined=True loading, embedding and uploading run as overlapping stages connected by
+        queues of queue_size batches; without a manifest faq_contexts can then be a lazy generator
+        (e.g. loader.iter_allFiles) so that loading overlaps too.
+        dedupe="drop" or "merge" removes near-duplicate entries first (MinHash similarity >= dedupe_threshold,
+        "merge" keeps the sources of the removed ones), see loader.deduplicate.
+        An existing collection whose vectors don't have vector_dim dimensions (VECTOR_DIM was changed) can't be
+        searched: it is recreated and re-ingested with recreate_on_dim_change (the embedding cache keeps the full
+        vectors, so that needs no model calls), otherwise a ValueError is raised.
+        Returns how many entries were added, updated, removed and skipped, plus per-stage throughput
+        under "stages" when pipelined.
         """
+        ingest_start = time.perf_counter()
+        dedupe_stats = None
+        if dedupe:
+            faq_contexts, dedupe_stats = deduplicate(list(faq_contexts), mode=dedupe, threshold=dedupe_threshold)
+            logger.info(f"Near-duplicate stage: kept {dedupe_stats['kept']} of {dedupe_stats['entries']} entries, "
+                        f"{dedupe_stats['duplicates']} embeddings and {dedupe_stats['near_duplicates']} points saved.")
         # Check if collection exists, create if not
-        try:
-            self.client.get_collection(collection_name=self.collection_name)
-            print(f"Collection '{self.collection_name}' already exists. Skipping creation.")
-        except Exception:
-            print(f"Creating collection '{self.collection_name}'...")
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=models.VectorParams(
-                    size=self.vector_dim,
-                    distance=models.Distance.DOT
-                ),
-            )
-        
-        print("Updating collection indexing threshold...")
-        # Set a indexing threshold for faster indexing during ingestion.
-        self.client.update_collection(
-            collection_name=self.collection_name,
-            optimizer_config=models.OptimizersConfigDiff(indexing_threshold=20000)
-        )
+        created = False
+        stored_dim = self.vector_store.dimension() if self.collection_exists() else None
+        if stored_dim is not None and stored_dim != self.vector_dim:
+            if not recreate_on_dim_change:
+                raise ValueError(f"Collection '{self.collection_name}' stores {stored_dim}-dimensional vectors, but vector_dim is "
+                                 f"{self.vector_dim}. Delete the collection or allow recreating it (RECREATE_ON_DIM_CHANGE=1).")
+            logger.warning(f"Collection '{self.collection_name}' stores {stored_dim}-dimensional vectors instead of "
+                           f"{self.vector_dim}, recreating it.")
+            self.vector_store.drop()
+        if self.collection_exists():
+            logger.info(f"Collection '{self.collection_name}' already exists. Skipping creation.")
+        else:
+            logger.info(f"Creating collection '{self.collection_name}'...")
+            self.vector_store.create(self.vector_dim)
+            if self.lexical_index is not None:
+                self.lexical_index.clear()
+            created = True
+
+        if manifest is not None:
+            # The diff needs every id, so the entries are materialized (they are small, the vectors are not)
+            faq_contexts = list(faq_contexts)
+            # The manifest is only trustworthy if the points it describes are still there (e.g. Qdrant storage was wiped)
+            if created or self.vector_store.count() != len(manifest.entries):
+                manifest.reset()
+            added, updated, removed, skipped = manifest.diff(faq_contexts)
+            to_embed = added + updated
+            if self.lexical_index is not None and len(self.lexical_index) != len(manifest.entries):
+                # The lexical index got lost or out of sync: rebuild it, that doesn't need the model
+                self.lexical_index.clear()
+                self.lexical_index.upsert([entry for entry in faq_contexts if entry["id"] in manifest.entries])
+        else:
+            if not pipelined:
+                faq_contexts = list(faq_contexts)
+            added, updated, removed, skipped = [], [], [], 0
+            to_embed = faq_contexts
+
+        stats: Dict[str, Any] = {"added": len(added), "updated": len(updated), "removed": len(removed), "skipped": skipped}
+        if dedupe_stats is not None:
+            stats["duplicates"] = dedupe_stats["duplicates"]
+            stats["near_duplicates"] = dedupe_stats["near_duplicates"]
+
+        if removed:
+            logger.info(f"Deleting {len(removed)} points whose entries no longer exist...")
+            self.vector_store.delete(removed)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(removed)
+
+        ingested = 0
+        ingesting = False
+        # to_embed may be a generator here, which is always worth starting
+        if not isinstance(to_embed, list) or to_embed:
+            ingesting = True
+            self.vector_store.begin_ingest()
+            if self.embed_scheduler is not None:
+                self.embed_scheduler.reset_stats()
+            if pipelined:
+                stats["stages"] = self._ingest_pipelined(to_embed, batch_size, upload_batch_size, upload_parallel, queue_size)
+                ingested = stats["stages"]["upload"]["items"]
+            else:
+                ingested = self._ingest(to_embed, batch_size, upload_batch_size, upload_parallel)
+        if manifest is None:
+            stats["added"] = ingested
+        if ingesting and self.embed_scheduler is not None:
+            # Planned, not measured at the model call (see LengthBucketScheduler)
+            stats["padding_estimate"] = self.embed_scheduler.stats()
+            logger.info(f"Embedded {stats['padding_estimate']['texts']} texts in {stats['padding_estimate']['batches']} batches, "
+                        f"estimated padding ratio {stats['padding_estimate']['padding_ratio']:.1%}")
+
+        if created or ingesting or removed:
+            # Post-ingest optimize phase: indexing is switched back on (Qdrant builds the HNSW index now)
+            self.vector_store.end_ingest()
+            if self.lexical_index is not None:
+                self.lexical_index.save()
+            self.result_cache.clear()
+            if self.semantic_cache is not None:
+                self.semantic_cache.clear()
+
+        if manifest is not None:
+            manifest.record_entries(faq_contexts)
+            manifest.save()
+        INGEST_STAGE_SECONDS.observe(time.perf_counter() - ingest_start, stage="total")
+
+        logger.info(f"Data ingestion complete. added={stats['added']} updated={stats['updated']} removed={stats['removed']} skipped={stats['skipped']}")
+        return stats
 
-        print(f"Embedding and ingesting {len(faq_contexts)} documents...")
-        points = []
-        for batch in tqdm(batch_generator(faq_contexts, batch_size), total=(len(faq_contexts)//batch_size)+1, desc="Processing batches"):
+    def embed_documents(self, contents: List[str], lengths: Optional[List[int]] = None) -> List[List[float]]:
+        """
+        Embeds the contents, taking the vectors from the embedding cache when they were computed before.
+        Only the cache misses go through the model, in length-bucketed batches when embed_token_budget is set.
+        lengths are the token lengths of contents that are already one planned batch (see _ingest).
+        """
+        with INGEST_STAGE_SECONDS.time(stage="embed"):
+            if self.embedding_store is None:
+                embeddings = self._embed_texts(contents, lengths)
+                INGESTED_ENTRIES.inc(len(embeddings), stage="embed")
+                logger.debug(f"Generated {len(embeddings)} embeddings for current batch.")
+                return embeddings
+
+            embeddings = self.embedding_store.get_many(contents)
+            missing = [i for i, vector in enumerate(embeddings) if vector is None]
+            if missing:
+                missing_contents = [contents[i] for i in missing]
+                computed = self._embed_texts(missing_contents, [lengths[i] for i in missing] if lengths is not None else None)
+                self.embedding_store.put_many(missing_contents, computed)
+                for i, vector in zip(missing, computed):
+                    embeddings[i] = vector
+            INGESTED_ENTRIES.inc(len(missing), stage="embed")
+            INGESTED_ENTRIES.inc(len(contents) - len(missing), stage="embedding_cache")
+            logger.debug(f"Generated {len(missing)} embeddings for current batch ({len(contents) - len(missing)} from cache).")
+            return embeddings
+
+    def _embed_texts(self, contents: List[str], lengths: Optional[List[int]] = None) -> List[List[float]]:
+        embed_batch = lambda texts: self.embed_model.get_text_embedding_batch(texts, show_progress_bar=False)
+        if self.embed_scheduler is None:
+            return embed_batch(contents)
+        return self.embed_scheduler.embed(contents, embed_batch, lengths=lengths)
+
+    def _ingest(self, faq_contexts: List[Dict], batch_size: int, upload_batch_size: int, upload_parallel: int) -> int:
+        """
+        Embeds the entries batch by batch and streams the points to Qdrant as they are produced.
+        With the length scheduler the batches are planned over all entries (similar lengths together,
+        at most batch_size each), so the upload order differs from the file order.
+        """
+        logger.info(f"Embedding and ingesting {len(faq_contexts)} documents...")
+        uploader = StreamingUploader(self.vector_store, batch_size=upload_batch_size, parallel=upload_parallel)
+        if self.embed_scheduler is not None:
+            # Tokenized and planned once here, the planned batches go to the model as they are
+            lengths = self.embed_scheduler.lengths([entry["content"] for entry in faq_contexts])
+            plan = self.embed_scheduler.plan(lengths, batch_size)
+            batches = [([faq_contexts[i] for i in batch], [lengths[i] for i in batch]) for batch in plan]
+        else:
+            batches = [(batch, None) for batch in batch_generator(faq_contexts, batch_size)]
+        for batch, batch_lengths in tqdm(batches, desc="Processing batches"):
             # Extract 'content' from each object in the batch
             contents = [entry["content"] for entry in batch]
-            embeddings = self.embed_model.get_text_embedding_batch(contents, show_progress_bar=False)
-            print(f"Generated {len(embeddings)} embeddings for current batch.")
-
-            for entry, vector in zip(batch, embeddings):
-                # Use a stable hash of the content as ID
-                entry_id = entry.get("id") or hashlib.md5(entry["content"].encode("utf-8")).hexdigest()
-                # Use the rest of the entry as payload (excluding id)
-                payload = {k: v for k, v in entry.items() if k != "id"}
-                point = models.PointStruct(
-                    id=entry_id,
-                    vector=vector,
-                    payload=payload
-                )
-                points.append(point)
+            embeddings = self.embed_documents(contents, batch_lengths)
+            self._upload_batch(uploader, batch, embeddings)
+        with INGEST_STAGE_SECONDS.time(stage="flush"):
+            uploaded = uploader.flush()
+        logger.info(f"Uploaded {uploaded} points.")
+        return uploaded
+
+    def _upload_batch(self, uploader: StreamingUploader, batch: List[Dict], embeddings: List[List[float]]):
+        # Mostly the time spent waiting for a free upload slot
+        with INGEST_STAGE_SECONDS.time(stage="upload"):
+            uploader.add(make_points(batch, self.stored_vectors(embeddings), self.stored_payload_fields))
+            if self.lexical_index is not None:
+                self.lexical_index.upsert(batch)
+        INGESTED_ENTRIES.inc(len(batch), stage="upload")
 
-        if points:
-            self.client.upload_points(
-                collection_name=self.collection_name,
-                points=points,
-                wait=False # Asynchronous upload for speed
+    def _ingest_pipelined(self, faq_contexts: Iterable[Dict], batch_size: int, upload_batch_size: int, upload_parallel: int, queue_size: int) -> Dict[str, Dict[str, Any]]:
+        """
+        Same as _ingest, but loading, embedding and uploading overlap. Returns the per-stage throughput.
+        The entries arrive as a stream, so the length scheduler only regroups the texts within each batch.
+        """
+        logger.info("Embedding and ingesting documents (pipelined)...")
+        uploader = StreamingUploader(self.vector_store, batch_size=upload_batch_size, parallel=upload_parallel)
+        with tqdm(desc="Processing entries", unit="entry") as progress:
+            stages = run_ingest_pipeline(
+                faq_contexts,
+                embed=self.embed_documents,
+                upload=lambda batch, embeddings: self._upload_batch(uploader, batch, embeddings),
+                batch_size=batch_size,
+                queue_size=queue_size,
+                on_batch=progress.update,
             )
+        # The last uploads still have to be applied before the data is searchable, that is upload time too
+        flush_start = time.perf_counter()
+        uploaded = uploader.flush()
+        INGEST_STAGE_SECONDS.observe(time.perf_counter() - flush_start, stage="flush")
+        stages["upload"]["flush_seconds"] = round(time.perf_counter() - flush_start, 4)
+
+        bottleneck = max(stages, key=lambda name: stages[name]["busy_seconds"])
+        for name, stage in stages.items():
+            logger.info(f"Stage {name}: {stage['items']} entries, {stage['items_per_second']} entries/s busy, waited {stage['waiting_seconds']}s")
+        logger.info(f"Uploaded {uploaded} points. Bottleneck stage: {bottleneck}")
+        return stages
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embeds a (normalized) query, reusing the vector if the same query was embedded before."""
+        query_embedding = self.query_embedding_cache.get(query)
+        cache_lookup("query_embedding", query_embedding is not None)
+        if query_embedding is None:
+            query_embedding = self.embed_model.get_query_embedding(query)
+            self.query_embedding_cache.put(query, query_embedding)
+        return query_embedding
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embeds several (normalized) queries with a single model call, cached ones are not embedded again."""
+        embeddings = [self.query_embedding_cache.get(query) for query in queries]
+        missing = [i for i, vector in enumerate(embeddings) if vector is None]
+        for vector in embeddings:
+            cache_lookup("query_embedding", vector is not None)
+        if missing:
+            missing_queries = [queries[i] for i in missing]
+            if hasattr(self.embed_model, "get_query_embedding_batch"):
+                computed = self.embed_model.get_query_embedding_batch(missing_queries)
+            else:
+                computed = [self.embed_model.get_query_embedding(query) for query in missing_queries]
+            for i, query, vector in zip(missing, missing_queries, computed):
+                self.query_embedding_cache.put(query, vector)
+                embeddings[i] = vector
+        return embeddings
 
-        print("Data ingestion complete.")
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters of the query caches."""
+        stats = {
+            "query_embedding": self.query_embedding_cache.stats(),
+            "result": self.result_cache.stats(),
+        }
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.stats()
+        return stats
 
+    def semantic_lookup(self, query_embedding: List[float], params: tuple) -> Optional[tuple]:
+        """(hits, plan) of an earlier query similar enough to this one, or None."""
+        if self.semantic_cache is None:
+            return None
+        with QUERY_STAGE_SECONDS.time(stage="semantic_cache"):
+            cached = self.semantic_cache.get(query_embedding, params)
+        cache_lookup("semantic", cached is not None)
+        return cached
 
-    def answer_question(self, query: str, top_k: int = 3) -> str:
+    def answer_question(self, query: str, top_k: int = 3, score_threshold: float = 0.5, mode: Optional[str] = None) -> str:
         """
         Searches the vector database for a given query and returns the most relevant contexts.
+        mode is "dense", "hybrid" or "lexical" (defaults to the engine's retrieval_mode).
         """
-        # 1. Create an embedding for the user's query
-        query_embedding = self.embed_model.get_query_embedding(query)
-
-        # 2. Search Qdrant for the most similar vectors
-        search_result = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_embedding,
-            limit=top_k,
-            score_threshold=0.5 # Optional: filter out less relevant results
-        )
+        query = normalize_query(query)
+        mode = mode or self.retrieval_mode
+        cache_key = (query, top_k, score_threshold, mode)
+        cached = self.result_cache.get(cache_key)
+        cache_lookup("result", cached is not None)
+        if cached is not None:
+            return cached
 
+        search_result, plan = self._search(query, top_k, score_threshold, mode)
         # 3. Format the results into a human-readable response
+        formatted_output = self.finish_answer(search_result, top_k, plan)
+        self.result_cache.put(cache_key, formatted_output)
+        return formatted_output
+
+    def retrieve(self, query: str, top_k: int = 3, score_threshold: float = 0.5, mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Same search as answer_question(), but returns the hits instead of a formatted text:
+        {"query", "results": [{"id", "score", "content", "source"}]}, best first.
+        """
+        query = normalize_query(query)
+        mode = mode or self.retrieval_mode
+        cache_key = ("results", query, top_k, score_threshold, mode)
+        cached = self.result_cache.get(cache_key)
+        cache_lookup("result", cached is not None)
+        if cached is not None:
+            return cached
+
+        search_result, plan = self._search(query, top_k, score_threshold, mode)
+        result = self.finish_results(query, search_result, top_k, plan)
+        self.result_cache.put(cache_key, result)
+        return result
+
+    def _search(self, query: str, top_k: int, score_threshold: float, mode: str):
+        """The hits for a (normalized) query and the plan that found them."""
+        plan = self.plan_query(query, mode)
+        search_result = None
+        if plan == "lexical":
+            # Keyword query: BM25 only, no model inference
+            search_result = self.lexical_search(query, top_k)
+            if not search_result and mode != "lexical":
+                search_result, plan = None, "dense"
+
+        if search_result is None:
+            # 1. Create an embedding for the user's query
+            with QUERY_STAGE_SECONDS.time(stage="embed"):
+                query_embedding = self.embed_query(query)
+            semantic_key = (top_k, score_threshold, plan)
+            cached = self.semantic_lookup(query_embedding, semantic_key)
+            if cached is not None:
+                return cached
+
+            # 2. Search Qdrant for the most similar vectors
+            with QUERY_STAGE_SECONDS.time(stage="search"):
+                search_result = self.dense_search(
+                    query_embedding,
+                    limit=self.candidate_count(plan, top_k),
+                    score_threshold=score_threshold # Optional: filter out less relevant results
+                )
+            if plan == "hybrid":
+                search_result = self.fuse(search_result, self.lexical_search(query, self.candidate_count(plan, top_k)), top_k)
+            if self.semantic_cache is not None:
+                self.semantic_cache.put(query_embedding, semantic_key, (search_result, plan))
+        return search_result, plan
+
+    def stored_vectors(self, embeddings: List[List[float]]) -> List[List[float]]:
+        """Full model vectors -> the vectors kept in the collection (truncated when vector_dim is smaller)."""
+        if self.vector_dim == self.model_dim:
+            return embeddings
+        return reduce_dimension(embeddings, self.vector_dim, self.matryoshka_layer_norm).tolist()
+
+    def first_stage(self, limit: int, score_threshold: Optional[float]):
+        """Limit and threshold of the vector search; with rescoring the threshold is applied afterwards."""
+        if self.rescore_candidates:
+            return limit * self.rescore_candidates, None
+        return limit, score_threshold
+
+    def rescore(self, query_embedding: List[float], hits: List[Any], limit: int, score_threshold: Optional[float]) -> List[Any]:
+        """Second stage: scores the candidates with the full vectors and keeps the best `limit`."""
+        if not self.rescore_candidates or not hits:
+            return hits
+        with QUERY_STAGE_SECONDS.time(stage="rescore"):
+            full = self.embedding_store.get_many([(hit.payload or {}).get("content", "") for hit in hits])
+            query = np.asarray(query_embedding, dtype=np.float32)
+            for hit, vector in zip(hits, full):
+                if vector is not None:  # not cached any more: keep the first stage score
+                    hit.score = float(np.dot(query, np.asarray(vector, dtype=np.float32)))
+            hits = sorted(hits, key=lambda hit: hit.score, reverse=True)
+            if score_threshold is not None:
+                hits = [hit for hit in hits if hit.score >= score_threshold]
+            return hits[:limit]
+
+    def dense_search(self, query_embedding: List[float], limit: int, score_threshold: Optional[float]) -> List[Any]:
+        first_limit, first_threshold = self.first_stage(limit, score_threshold)
+        hits = self.vector_store.search(self.stored_vectors([query_embedding])[0], limit=first_limit, score_threshold=first_threshold)
+        return self.rescore(query_embedding, hits, limit, score_threshold)
+
+    def dense_search_batch(self, embeddings: List[List[float]], limit: int, score_threshold: Optional[float]) -> List[List[Any]]:
+        first_limit, first_threshold = self.first_stage(limit, score_threshold)
+        searched = self.vector_store.search_batch(self.stored_vectors(embeddings), limit=first_limit, score_threshold=first_threshold)
+        return [self.rescore(embedding, hits, limit, score_threshold) for embedding, hits in zip(embeddings, searched)]
+
+    def finish_answer(self, search_result: List[Any], top_k: int, plan: str) -> str:
+        """Counts the query and formats its answer."""
+        QUERIES.inc(plan=plan)
+        if not search_result:
+            EMPTY_RESULTS.inc(plan=plan)
+        with QUERY_STAGE_SECONDS.time(stage="format"):
+            return self.format_answer(search_result, top_k)
+
+    def finish_results(self, query: str, search_result: List[Any], top_k: int, plan: str) -> Dict[str, Any]:
+        """Counts the query and returns its hits as plain data (the structured version of finish_answer)."""
+        QUERIES.inc(plan=plan)
+        if not search_result:
+            EMPTY_RESULTS.inc(plan=plan)
+        results = []
+        for hit in search_result[:top_k]:
+            payload = hit.payload or {}
+            results.append({
+                "id": str(hit.id),
+                "score": round(hit.score, 4),
+                "content": payload.get("content", ""),
+                "source": payload.get("source", "unknown"),
+            })
+        return {"query": query, "score_type": SCORE_TYPES[plan], "results": results}
+
+    def answer_questions(self, queries: List[str], top_k: int = 3, score_threshold: float = 0.5, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Answers several queries at once: one batched embedding call and one batch search for all of them.
+        Returns one result per query, in order: {"query", "answer", "score_type", "results": [{"id", "score", "source"}]}
+        (score_type tells what the scores are, see SCORE_TYPES).
+        """
+        queries, plans, hits = self._start_batch(queries, mode or self.retrieval_mode, top_k)
+        pending = [i for i, found in enumerate(hits) if found is None]
+        if pending:
+            with QUERY_STAGE_SECONDS.time(stage="embed_batch"):
+                embeddings = self.embed_queries([queries[i] for i in pending])
+            limit = max(self.candidate_count(plans[i], top_k) for i in pending)
+            with QUERY_STAGE_SECONDS.time(stage="search_batch"):
+                searched = self.dense_search_batch(embeddings, limit=limit, score_threshold=score_threshold)
+            self._finish_batch(queries, plans, hits, pending, searched, top_k)
+        return [self.batch_result(query, found, top_k, plan) for query, found, plan in zip(queries, hits, plans)]
+
+    def _start_batch(self, queries: List[str], mode: str, top_k: int):
+        """Normalizes the queries and answers the keyword ones from the lexical index right away."""
+        queries = [normalize_query(query) for query in queries]
+        plans = [self.plan_query(query, mode) for query in queries]
+        hits: List[Optional[List[Any]]] = [None] * len(queries)
+        for i, query in enumerate(queries):
+            if plans[i] == "lexical":
+                found = self.lexical_search(query, top_k)
+                if found or mode == "lexical":
+                    hits[i] = found
+                else:
+                    plans[i] = "dense"
+        return queries, plans, hits
+
+    def _finish_batch(self, queries, plans, hits, pending, searched, top_k: int):
+        for i, found in zip(pending, searched):
+            if plans[i] == "hybrid":
+                limit = self.candidate_count("hybrid", top_k)
+                hits[i] = self.fuse(found[:limit], self.lexical_search(queries[i], limit), top_k)
+            else:
+                hits[i] = found[:top_k]
+
+    def batch_result(self, query: str, search_result: List[Any], top_k: int, plan: str) -> Dict[str, Any]:
+        QUERIES.inc(plan="batch")
+        if not search_result:
+            EMPTY_RESULTS.inc(plan="batch")
+        return {
+            "query": query,
+            "answer": self.format_answer(search_result, top_k),
+            "score_type": SCORE_TYPES[plan],
+            "results": [
+                {"id": str(hit.id), "score": round(hit.score, 4), "source": (hit.payload or {}).get("source")}
+                for hit in search_result
+            ],
+        }
+
+    def plan_query(self, query: str, mode: str) -> str:
+        """
+        Decides how a query is answered: "dense", "hybrid" or "lexical".
+        In hybrid mode, short queries made only of indexed terms (enumerate, __slots__, yield) take the
+        lexical fast path and skip the embedding model.
+        """
+        if self.lexical_index is None or not len(self.lexical_index) or mode == "dense":
+            return "dense"
+        if mode == "lexical":
+            return "lexical"
+        terms = tokenize(query, keep_stopwords=True)
+        if 0 < len(terms) <= 2 and all(term in self.lexical_index for term in terms):
+            return "lexical"
+        return "hybrid"
+
+    def candidate_count(self, plan: str, top_k: int) -> int:
+        return top_k * self.hybrid_candidates if plan == "hybrid" else top_k
+
+    def lexical_search(self, query: str, limit: int) -> List[models.ScoredPoint]:
+        """BM25 hits in the same shape as the vector store hits."""
+        with QUERY_STAGE_SECONDS.time(stage="lexical"):
+            return [
+                models.ScoredPoint(id=doc_id, version=0, score=score, payload=dict(self.lexical_index.docs[doc_id]))
+                for doc_id, score in self.lexical_index.search(query, limit, min_score=self.lexical_min_score)
+            ]
+
+    @staticmethod
+    def fuse(dense_hits: List[Any], lexical_hits: List[Any], top_k: int) -> List[models.ScoredPoint]:
+        """
+        Reciprocal rank fusion of the dense and lexical hits; the score is the fused score.
+        Both lists are already filtered (score_threshold / lexical_min_score), so every fused hit passed one of them.
+        """
+        payloads = {str(hit.id): hit.payload for hit in lexical_hits}
+        payloads.update({str(hit.id): hit.payload for hit in dense_hits})
+        fused = reciprocal_rank_fusion([[str(hit.id) for hit in dense_hits], [str(hit.id) for hit in lexical_hits]])
+        return [
+            models.ScoredPoint(id=doc_id, version=0, score=score, payload=payloads[doc_id])
+            for doc_id, score in fused[:top_k]
+        ]
+
+    def format_answer(self, search_result: List[Any], top_k: int) -> str:
+        """Builds the human-readable answer from the Qdrant hits."""
         if not search_result:
             return "I couldn't find a relevant answer in my knowledge base."
 
@@ -163,6 +806,145 @@ class FAQEngine:
             # Fallback if no content extracted
             formatted_output = "Found relevant information, but couldn't extract a clear answer."
         
-        print("Formatted output:", formatted_output)
+        logger.debug("Formatted output: %s", formatted_output, extra=SAMPLED)
+        return formatted_output
+
+
+class AsyncFAQEngine:
+    """
+    Async retrieval on top of an FAQEngine, so concurrent MCP calls don't block the server event loop.
+    The model inference runs in a bounded thread pool and the search goes through the async vector store
+    (AsyncQdrantClient for Qdrant),
+    so many in-flight queries overlap their network wait. At most `max_concurrency` queries are
+    processed at once; the others wait in line instead of fighting over the CPU.
+    Ingestion stays on the sync FAQEngine, the caches are shared with it.
+    """
+    def __init__(self,
+                 engine: FAQEngine,
+                 max_concurrency: int = 8,
+                 embed_workers: int = 2,
+                 micro_batch_size: int = 32,
+                 micro_batch_wait_ms: float = 5.0):
+        self.engine = engine
+        self.collection_name = engine.collection_name
+        self.vector_store = engine.vector_store
+        self.executor = ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix="embed")
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # Queries arriving within micro_batch_wait_ms share one model call (at most max_concurrency of them
+        # can be waiting, so that bounds the batch too). micro_batch_size <= 1 embeds every query alone.
+        self.batcher = None
+        if micro_batch_size > 1:
+            self.batcher = QueryBatcher(engine.embed_queries, self.executor, max_batch_size=micro_batch_size, max_wait_ms=micro_batch_wait_ms)
+
+    def for_engine(self, engine: FAQEngine) -> "AsyncFAQEngine":
+        """
+        The async side of another collection's engine (see FAQEngine.for_collection). The embedding threads,
+        the micro-batcher and the max_concurrency limit are shared, query vectors don't depend on the collection.
+        """
+        async_engine = copy.copy(self)
+        async_engine.engine = engine
+        async_engine.collection_name = engine.collection_name
+        async_engine.vector_store = engine.vector_store
+        return async_engine
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Runs the (cached) query embedding in the embedding thread pool, micro-batched with concurrent queries."""
+        # Only the hit is counted here, on a miss embed_query/embed_queries do the counted lookup
+        cached = self.engine.query_embedding_cache.get(query, count_miss=False)
+        if cached is not None:
+            cache_lookup("query_embedding", True)
+            return cached
+        if self.batcher is not None:
+            return await self.batcher.embed(query)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.engine.embed_query, query)
+
+    async def answer_question(self, query: str, top_k: int = 3, score_threshold: float = 0.5, mode: Optional[str] = None) -> str:
+        """
+        Async version of FAQEngine.answer_question().
+        """
+        engine = self.engine
+        query = normalize_query(query)
+        mode = mode or engine.retrieval_mode
+        cache_key = (query, top_k, score_threshold, mode)
+        cached = engine.result_cache.get(cache_key)
+        cache_lookup("result", cached is not None)
+        if cached is not None:
+            return cached
+
+        search_result, plan = await self._search(query, top_k, score_threshold, mode)
+        formatted_output = engine.finish_answer(search_result, top_k, plan)
+        engine.result_cache.put(cache_key, formatted_output)
         return formatted_output
-    
+
+    async def retrieve(self, query: str, top_k: int = 3, score_threshold: float = 0.5, mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async version of FAQEngine.retrieve().
+        """
+        engine = self.engine
+        query = normalize_query(query)
+        mode = mode or engine.retrieval_mode
+        cache_key = ("results", query, top_k, score_threshold, mode)
+        cached = engine.result_cache.get(cache_key)
+        cache_lookup("result", cached is not None)
+        if cached is not None:
+            return cached
+
+        search_result, plan = await self._search(query, top_k, score_threshold, mode)
+        result = engine.finish_results(query, search_result, top_k, plan)
+        engine.result_cache.put(cache_key, result)
+        return result
+
+    async def _search(self, query: str, top_k: int, score_threshold: float, mode: str):
+        engine = self.engine
+        plan = engine.plan_query(query, mode)
+        search_result = None
+        if plan == "lexical":
+            search_result = engine.lexical_search(query, top_k)
+            if not search_result and mode != "lexical":
+                search_result, plan = None, "dense"
+        if search_result is None:
+            limit = engine.candidate_count(plan, top_k)
+            async with self.semaphore:
+                with QUERY_STAGE_SECONDS.time(stage="embed"):
+                    query_embedding = await self.embed_query(query)
+                semantic_key = (top_k, score_threshold, plan)
+                cached = engine.semantic_lookup(query_embedding, semantic_key)
+                if cached is not None:
+                    return cached
+                with QUERY_STAGE_SECONDS.time(stage="search"):
+                    first_limit, first_threshold = engine.first_stage(limit, score_threshold)
+                    search_result = await self.vector_store.asearch(
+                        engine.stored_vectors([query_embedding])[0],
+                        limit=first_limit,
+                        score_threshold=first_threshold
+                    )
+                    search_result = engine.rescore(query_embedding, search_result, limit, score_threshold)
+            if plan == "hybrid":
+                search_result = engine.fuse(search_result, engine.lexical_search(query, limit), top_k)
+            if engine.semantic_cache is not None:
+                engine.semantic_cache.put(query_embedding, semantic_key, (search_result, plan))
+        return search_result, plan
+
+    async def answer_questions(self, queries: List[str], top_k: int = 3, score_threshold: float = 0.5, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Async version of FAQEngine.answer_questions(): one embedding call and one batch search.
+        """
+        engine = self.engine
+        queries, plans, hits = engine._start_batch(queries, mode or engine.retrieval_mode, top_k)
+        pending = [i for i, found in enumerate(hits) if found is None]
+        if pending:
+            limit = max(engine.candidate_count(plans[i], top_k) for i in pending)
+            async with self.semaphore:
+                loop = asyncio.get_running_loop()
+                with QUERY_STAGE_SECONDS.time(stage="embed_batch"):
+                    embeddings = await loop.run_in_executor(self.executor, engine.embed_queries, [queries[i] for i in pending])
+                with QUERY_STAGE_SECONDS.time(stage="search_batch"):
+                    first_limit, first_threshold = engine.first_stage(limit, score_threshold)
+                    searched = await self.vector_store.asearch_batch(engine.stored_vectors(embeddings), limit=first_limit, score_threshold=first_threshold)
+                    searched = [engine.rescore(embedding, hits, limit, score_threshold) for embedding, hits in zip(embeddings, searched)]
+            engine._finish_batch(queries, plans, hits, pending, searched, top_k)
+        return [engine.batch_result(query, found, top_k, plan) for query, found, plan in zip(queries, hits, plans)]
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,71 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class QueryBatcher:
+    """
+    Micro-batches query embeddings of concurrent callers.
+    The first query opens a window of `max_wait_ms`; every query arriving in that window (up to
+    `max_batch_size`) is embedded in the same model call, which costs barely more than a single query.
+    Each caller gets its own vector back. Identical queries in a batch are embedded once.
+    """
+    def __init__(self,
+                 embed_batch: Callable[[List[str]], List[List[float]]],
+                 executor: Optional[Executor] = None,
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0):
+        self.embed_batch = embed_batch
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.queries = 0
+
+    async def embed(self, query: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            # keep a reference, otherwise the task can be garbage collected while running
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        unique = list(dict.fromkeys(query for query, _ in batch))
+        self.batches += 1
+        self.queries += len(batch)
+        try:
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(self.executor, self.embed_batch, unique)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_query = dict(zip(unique, vectors))
+        for query, future in batch:
+            if not future.done():  # the caller may have been cancelled meanwhile
+                future.set_result(by_query[query])
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+        }
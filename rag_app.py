@@ -1,12 +1,15 @@
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from itertools import islice
 from typing import List, Dict, Any, Generator
 import hashlib
 
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from tqdm import tqdm
 from qdrant_client import models, QdrantClient
 
+from embedders import make_embedder
+
 
 # rag_app.py provides a simple example of how to set up and use the FAQEngine class to create a string FAQ knowledge base using Qdrant and HuggingFace embeddings.
 # you can connect it with the mcp_server.py to create a RAG application with tools for both FAQ retrieval and web search. right now mcp_server.py is connected with newRag.py 
@@ -64,22 +67,22 @@ class FAQEngine:
     def __init__(self,
                  qdrant_url: str = "http://localhost:6333",
                  collection_name: str = "python-faq",
-                 embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5"): # this model is comingfrom nomic-ai, it is a good general purpose embedding model
+                 embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5", # this model is comingfrom nomic-ai, it is a good general purpose embedding model
+                 embed_backend: str = "hf",
+                 onnx_model_dir: str = "./onnx_model"):
         
         self.collection_name = collection_name
         
-        # Initialize the embedding model
+        # Initialize the embedding model, "hf" (PyTorch) or "onnx" (int8 export made by export_onnx.py), see embedders.py
         print("Loading embedding model...")
-        # HuggingFaceEmbedding  is a wrapping class like a loader, it doesn't provide model-it knows how to talk to Hugging Face Hub and download the model if not present locally
-        # Only when you pretty sure the custom model is safe, set trust_remote_code=True, otherwise it can be a security risk
-        self.embed_model = HuggingFaceEmbedding(
-            model_name=embed_model_name,
-            trust_remote_code=True,
-            revision="e5cf08aadaa33385f5990def41f7a23405aec398" # <-- Pin to a specific commit revision to avoid future breaking changes, without this it will always get the latest version, using "main" is to get the latest version (can be unstable
+        self.embed_model = make_embedder(
+            embed_backend,
+            embed_model_name,
+            "e5cf08aadaa33385f5990def41f7a23405aec398", # <-- Pin to a specific commit revision to avoid future breaking changes, without this it will always get the latest version, using "main" is to get the latest version (can be unstable
+            onnx_model_dir=onnx_model_dir,
         )
         
-        # Dynamically get the vector dimension from the model
-        self.vector_dim = len(self.embed_model.get_text_embedding("test"))
+        self.vector_dim = self.embed_model.dim
         print(f"Embedding model loaded. Vector dimension: {self.vector_dim}")
 
         # Initialize the Qdrant client
@@ -107,9 +110,10 @@ class FAQEngine:
                 return qa_text  # fallback to the whole text
         return qa_text
 
-    def setup_collection(self, faq_contexts: List[str], batch_size: int = 64):
+    def setup_collection(self, faq_contexts: List[str], batch_size: int = 64, upload_parallel: int = 2):
         """
         Creates a Qdrant collection (if it doesn't exist) and ingests the FAQ data.
+        Each embedded batch is uploaded right away; the method returns once the data is searchable.
         """
         # Check if collection exists, create if not
         try:
@@ -133,24 +137,41 @@ class FAQEngine:
         )
 
         print(f"Embedding and ingesting {len(faq_contexts)} documents...")
-        points = []
-        for batch in tqdm(batch_generator(faq_contexts, batch_size),total=(len(faq_contexts)//batch_size)+1,desc="Processing batches"): 
-            #batch is a list of strings
-            embeddings = self.embed_model.get_text_embedding_batch(batch, show_progress_bar=False) #returns a list of vectors like [[0.1,0.2,...],[0.2,0.3,...],...]
-            for context, vector in zip(batch, embeddings):
-                question = self.extract_question(context)
-                point = models.PointStruct(
-                    id=hash_content(question), # Use stable hash of content as ID
-                    vector=vector,
-                    payload={"context": context,"question": question} # Store both question and full context in payload for richer responses
-                )
-                points.append(point)
-
-        self.client.upload_points(
-            collection_name=self.collection_name,
-            points=points,
-            wait=False # Asynchronous upload for speed
-        )
+        # Upload every batch as soon as it is embedded instead of keeping all points in memory,
+        # with at most upload_parallel uploads in flight
+        uploaded = 0
+        in_flight = deque()
+        last_points = []
+        with ThreadPoolExecutor(max_workers=upload_parallel) as executor:
+            for batch in tqdm(batch_generator(faq_contexts, batch_size),total=(len(faq_contexts)//batch_size)+1,desc="Processing batches"): 
+                #batch is a list of strings
+                embeddings = self.embed_model.get_text_embedding_batch(batch, show_progress_bar=False) #returns a list of vectors like [[0.1,0.2,...],[0.2,0.3,...],...]
+                points = []
+                for context, vector in zip(batch, embeddings):
+                    question = self.extract_question(context)
+                    point = models.PointStruct(
+                        id=hash_content(question), # Use stable hash of content as ID
+                        vector=vector,
+                        payload={"context": context,"question": question} # Store both question and full context in payload for richer responses
+                    )
+                    points.append(point)
+
+                # The previous batch is sent now, the newest one is kept back for the final wait below
+                if last_points:
+                    if len(in_flight) >= upload_parallel:
+                        in_flight.popleft().result()
+                    in_flight.append(executor.submit(self.client.upsert, collection_name=self.collection_name, points=last_points, wait=False))
+                    uploaded += len(last_points)
+                last_points = points
+
+            for future in in_flight:
+                future.result()
+
+        if last_points:
+            # Qdrant applies updates in order, so once the last batch is applied the whole data is searchable
+            self.client.upsert(collection_name=self.collection_name, points=last_points, wait=True)
+            uploaded += len(last_points)
+        print(f"Uploaded {uploaded} points.")
 
         print("Data ingestion complete.")
 
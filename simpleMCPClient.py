@@ -1,8 +1,55 @@
 import asyncio
 import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
 from fastmcp import Client
 
-client = Client("http://localhost:8000/mcp")
+SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8000/mcp")
+
+client = Client(SERVER_URL)
+
+
+class MCPSession:
+    """
+    Keeps one MCP session open for many calls, unlike call_tool() below which connects (and lists the
+    tools) on every call. The tool list is fetched once and cached, calls can run concurrently over the
+    same session and at most max_concurrency of them are in flight at once.
+
+        async with MCPSession(max_concurrency=8) as session:
+            results = await session.call_many([("python_faq_retrieval_tool", {"query": q}) for q in queries])
+    """
+    def __init__(self, url: str = SERVER_URL, max_concurrency: int = 8):
+        self.client = Client(url)
+        self.max_concurrency = max(1, max_concurrency)
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._tools: Optional[List[Any]] = None
+
+    async def __aenter__(self) -> "MCPSession":
+        await self.client.__aenter__()
+        await self.list_tools()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.__aexit__(*exc_info)
+
+    async def list_tools(self, refresh: bool = False) -> List[Any]:
+        if self._tools is None or refresh:
+            self._tools = await self.client.list_tools()
+        return self._tools
+
+    async def call(self, tool: str, args: Dict[str, Any]) -> Any:
+        if tool not in {t.name for t in self._tools or []}:
+            # Maybe the server got the tool after we connected
+            if tool not in {t.name for t in await self.list_tools(refresh=True)}:
+                raise ValueError(f"The server has no tool '{tool}'.")
+        async with self.semaphore:
+            return await self.client.call_tool(tool, args)
+
+    async def call_many(self, calls: Sequence[Tuple[str, Dict[str, Any]]], return_exceptions: bool = True) -> List[Any]:
+        """Results in the order of calls; a failed call gives its exception unless return_exceptions=False."""
+        return await asyncio.gather(*(self.call(tool, args) for tool, args in calls), return_exceptions=return_exceptions)
+
 
 async def call_tool(tool: str, args: dict):
     async with client:
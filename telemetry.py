@@ -0,0 +1,221 @@
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Seconds, from a cached lookup to a slow model call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. a cache size read when the metrics are scraped."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative buckets, sum and count, like the Prometheus client library."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., +Inf count, sum
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return int(series[-2]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {series[-2]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Registering the same name twice returns the existing metric (e.g. a module reloaded)
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Retrieval: stage is embed, search, lexical, fuse or format; plan is dense, hybrid or lexical
+QUERY_STAGE_SECONDS = REGISTRY.histogram("rag_query_stage_seconds", "Time spent in each stage of a retrieval query.", ("stage",))
+QUERIES = REGISTRY.counter("rag_queries_total", "Retrieval queries answered, by plan.", ("plan",))
+EMPTY_RESULTS = REGISTRY.counter("rag_empty_results_total", "Retrieval queries that found nothing.", ("plan",))
+CACHE_LOOKUPS = REGISTRY.counter("rag_cache_lookups_total", "Cache lookups by cache and result (hit or miss).", ("cache", "result"))
+CACHE_SIZE = REGISTRY.gauge("rag_cache_size", "Entries currently in a cache.", ("cache", "collection"))
+# MCP tools
+TOOL_SECONDS = REGISTRY.histogram("rag_tool_seconds", "Whole MCP tool call latency.", ("tool",))
+TOOL_ERRORS = REGISTRY.counter("rag_tool_errors_total", "MCP tool calls that failed or returned an error message.", ("tool",))
+# Ingestion: stage is embed, upload, flush or total
+INGEST_STAGE_SECONDS = REGISTRY.histogram("rag_ingest_stage_seconds", "Time spent in each ingestion stage (per batch, total per run).", ("stage",))
+INGESTED_ENTRIES = REGISTRY.counter("rag_ingested_entries_total", "Entries that went through an ingestion stage.", ("stage",))
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+@contextmanager
+def track_tool(tool: str) -> Iterator[None]:
+    """Times a tool call and counts it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        TOOL_ERRORS.inc(tool=tool)
+        raise
+    finally:
+        TOOL_SECONDS.observe(time.perf_counter() - start, tool=tool)
+
+
+# Logging. LOG_LEVEL sets the level of the "rag" loggers, LOG_SAMPLE_RATE the share of the
+# per-request records (logged with extra=SAMPLED) that are actually written.
+SAMPLED = {"sampled": True}
+
+
+class SampleFilter(logging.Filter):
+    """Lets through every record, except a random share of the ones marked with extra=SAMPLED."""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False):
+            return self.rate >= 1 or random.random() < self.rate
+        return True
+
+
+_configured = False
+
+
+def configure_logging(level: Optional[str] = None, sample_rate: Optional[float] = None):
+    """Sets up the "rag" logger once (stderr, with timestamps). Later calls only change level/sampling."""
+    global _configured
+    logger = logging.getLogger("rag")
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "0.01")) if sample_rate is None else sample_rate
+    logger.setLevel(level.upper())
+    if not _configured:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+        _configured = True
+    for handler in logger.handlers:
+        handler.filters = [SampleFilter(sample_rate)]
+
+
+def get_logger(name: str) -> logging.Logger:
+    if not _configured:
+        configure_logging()
+    return logging.getLogger(f"rag.{name}")
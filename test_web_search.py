@@ -0,0 +1,100 @@
+"""
+Tests of the pooled Firecrawl client against a local stand-in for the search API
+(the same thing FIRECRAWL_BASE_URL points the server at), no API key or network needed.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from web_search import FirecrawlClient, SearchError, format_results
+
+LONG_TEXT = "word " * 400
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(payload)
+        if payload["query"] == "slow":
+            time.sleep(1.0)
+        data = [
+            {"title": f"Result {i} {LONG_TEXT}", "url": f"https://example.com/{i}",
+             "description": LONG_TEXT, "markdown": LONG_TEXT}
+            for i in range(8)
+        ]
+        body = json.dumps({"success": True, "data": data}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server, **kwargs) -> FirecrawlClient:
+    return FirecrawlClient("test-key", base_url=f"http://127.0.0.1:{server.server_port}", **kwargs)
+
+
+def test_read_timeout_raises_search_error(stand_in):
+    client = make_client(stand_in, read_timeout=0.2)
+    start = time.perf_counter()
+    with pytest.raises(SearchError):
+        client.search("slow")
+    assert time.perf_counter() - start < 0.9
+    # The API is told to finish within the read timeout
+    assert stand_in.requests[0]["timeout"] == 200
+    # Failures are not cached
+    with pytest.raises(SearchError):
+        client.search("slow")
+    assert len(stand_in.requests) == 2
+    client.close()
+
+
+def test_results_are_cached_by_normalized_query_until_ttl(stand_in):
+    client = make_client(stand_in, cache_ttl=0.3)
+    first = client.search("What is  a decorator")
+    assert client.search("what is a decorator ") == first
+    assert len(stand_in.requests) == 1
+    time.sleep(0.4)
+    client.search("what is a decorator")
+    assert len(stand_in.requests) == 2
+    client.close()
+
+
+def test_compact_output_is_truncated(stand_in):
+    client = make_client(stand_in)
+    results = client.search("python")
+    client.close()
+
+    text = format_results("python", results, compact=True, max_results=5, max_field_chars=100, max_chars=4000)
+    assert len(text) <= 4000
+    assert "(3 more results not shown)" in text
+    assert "Excerpt:" in text
+    for line in text.splitlines()[1:]:
+        # "1. title — url" keeps the url after the cut title, the other lines hold one cut field
+        if not line.startswith("("):
+            assert len(line) <= 100 + len(" — https://example.com/0") + len("   Excerpt: ")
+
+    capped = format_results("python", results, compact=True, max_chars=500)
+    assert len(capped) <= 500
+    assert capped.endswith("...(truncated)")
+
+    full = format_results("python", results, compact=False)
+    assert "Full results (JSON):" in full
+    assert LONG_TEXT.strip() in full
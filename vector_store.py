@@ -0,0 +1,518 @@
+import asyncio
+import copy
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from qdrant_client import models, QdrantClient, AsyncQdrantClient
+
+from telemetry import get_logger
+
+logger = get_logger("vector_store")
+
+
+class VectorStore:
+    """
+    What FAQEngine needs from a vector database. Points are passed as qdrant `models.PointStruct`
+    and hits come back as `models.ScoredPoint`, whatever the backend is, and the distance is always DOT.
+    """
+    def exists(self) -> bool:
+        raise NotImplementedError
+
+    def create(self, dim: int):
+        raise NotImplementedError
+
+    def dimension(self) -> Optional[int]:
+        """Vector size of the existing collection, None when it doesn't exist or can't be told."""
+        raise NotImplementedError
+
+    def drop(self):
+        """Deletes the collection with all its points."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def upsert(self, points: List[models.PointStruct], wait: bool = True):
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def search(self, vector: List[float], limit: int, score_threshold: Optional[float] = None) -> List[models.ScoredPoint]:
+        raise NotImplementedError
+
+    def search_batch(self, vectors: List[List[float]], limit: int, score_threshold: Optional[float] = None) -> List[List[models.ScoredPoint]]:
+        """One result list per vector, in order. By default one search after the other."""
+        return [self.search(vector, limit, score_threshold) for vector in vectors]
+
+    async def asearch(self, vector: List[float], limit: int, score_threshold: Optional[float] = None) -> List[models.ScoredPoint]:
+        """Async search, by default the sync search in a worker thread."""
+        return await asyncio.to_thread(self.search, vector, limit, score_threshold)
+
+    async def asearch_batch(self, vectors: List[List[float]], limit: int, score_threshold: Optional[float] = None) -> List[List[models.ScoredPoint]]:
+        return await asyncio.to_thread(self.search_batch, vectors, limit, score_threshold)
+
+    def begin_ingest(self):
+        """Called before a batch of upserts."""
+
+    def end_ingest(self):
+        """Called once all upserts of an ingestion were sent."""
+
+    def close(self):
+        pass
+
+    def with_collection(self, collection_name: str) -> "VectorStore":
+        """A store with the same settings (and connection, where there is one) for another collection."""
+        raise NotImplementedError
+
+
+class _SerializedClient:
+    """
+    Qdrant's local mode is plain Python over NumPy arrays and not thread-safe (a search racing an
+    upload or another search can see half-resized arrays), so every call of the wrapped client holds one lock.
+    """
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
+
+
+class QdrantVectorStore(VectorStore):
+    """
+    A collection on a Qdrant server, over gRPC.
+    url can also be ":memory:" or a local folder, then Qdrant's local mode runs inside this process
+    (no server needed, used by the offline benchmark). Local mode always searches exactly, the
+    index settings below only matter on a server.
+
+    Collection settings, used when the collection is created:
+    - hnsw_m / hnsw_ef_construct: HNSW graph degree and build-time beam (None keeps Qdrant's 16 / 100)
+    - quantization: None, "scalar" (int8, 4x smaller) or "binary" (1 bit, 32x smaller, only for
+      models trained for it); the quantized vectors are kept in RAM
+    - on_disk: keep the original vectors on disk (memmapped), on_disk_payload: same for the payloads
+    - indexing_threshold: KB of vectors per segment above which the HNSW index is built. Indexing
+      is switched off while ingesting and set to this value afterwards (end_ingest), so the index
+      is built once in the optimize phase instead of being rebuilt during the upload.
+    Search settings, used on every search:
+    - hnsw_ef: search-time beam (None uses Qdrant's default), exact: brute force, no index
+    - rescore / oversampling: with quantization, fetch oversampling * limit candidates with the
+      quantized vectors and rescore them with the original ones
+    - payload_fields: only these payload fields come back with a hit (None: the whole payload); vectors never do
+    """
+    def __init__(self, url: str, collection_name: str,
+                 hnsw_m: Optional[int] = None,
+                 hnsw_ef_construct: Optional[int] = None,
+                 quantization: Optional[str] = None,
+                 on_disk: bool = False,
+                 on_disk_payload: bool = False,
+                 indexing_threshold: int = 20000,
+                 hnsw_ef: Optional[int] = None,
+                 exact: bool = False,
+                 rescore: bool = True,
+                 oversampling: Optional[float] = None,
+                 payload_fields: Optional[List[str]] = None):
+        if quantization not in (None, "scalar", "binary"):
+            raise ValueError(f"Unknown quantization '{quantization}', use None, 'scalar' or 'binary'.")
+        self.url = url
+        self.collection_name = collection_name
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self.quantization = quantization
+        self.on_disk = on_disk
+        self.on_disk_payload = on_disk_payload
+        self.indexing_threshold = indexing_threshold
+        self.search_params = self.make_search_params(hnsw_ef, exact, rescore if quantization else None, oversampling if quantization else None)
+        self.with_payload = list(payload_fields) if payload_fields else True
+        self.local = not url.startswith(("http://", "https://"))
+        if url == ":memory:":
+            self.client = _SerializedClient(QdrantClient(location=":memory:"))
+        elif self.local:
+            self.client = _SerializedClient(QdrantClient(path=url))
+        else:
+            self.client = QdrantClient(url=url, prefer_grpc=True)
+        # Shared with the stores of other collections made by with_collection()
+        self._shared = {"async_client": None}
+
+    def exists(self) -> bool:
+        return self.client.collection_exists(collection_name=self.collection_name)
+
+    def create(self, dim: int):
+        hnsw_config = None
+        if self.hnsw_m is not None or self.hnsw_ef_construct is not None:
+            hnsw_config = models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+        quantization_config = None
+        if self.quantization == "scalar":
+            quantization_config = models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        elif self.quantization == "binary":
+            quantization_config = models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=models.VectorParams(
+                size=dim,
+                distance=models.Distance.DOT,
+                on_disk=self.on_disk or None,
+            ),
+            hnsw_config=hnsw_config,
+            quantization_config=quantization_config,
+            on_disk_payload=self.on_disk_payload or None,
+        )
+
+    def dimension(self) -> Optional[int]:
+        if not self.exists():
+            return None
+        vectors = self.client.get_collection(collection_name=self.collection_name).config.params.vectors
+        # Named vectors (a dict) are not made by this app
+        return vectors.size if isinstance(vectors, models.VectorParams) else None
+
+    def drop(self):
+        self.client.delete_collection(collection_name=self.collection_name)
+
+    @staticmethod
+    def make_search_params(hnsw_ef: Optional[int] = None, exact: bool = False,
+                           rescore: Optional[bool] = None, oversampling: Optional[float] = None) -> Optional[models.SearchParams]:
+        """None when everything is left to Qdrant's defaults."""
+        quantization = None
+        if rescore is not None or oversampling is not None:
+            quantization = models.QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+        if hnsw_ef is None and not exact and quantization is None:
+            return None
+        return models.SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
+    def count(self) -> int:
+        return self.client.count(collection_name=self.collection_name, exact=True).count
+
+    def upsert(self, points: List[models.PointStruct], wait: bool = True):
+        self.client.upsert(collection_name=self.collection_name, points=points, wait=wait)
+
+    def delete(self, ids: List[str]):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=ids),
+        )
+
+    def search(self, vector: List[float], limit: int, score_threshold: Optional[float] = None,
+               search_params: Optional[models.SearchParams] = None) -> List[models.ScoredPoint]:
+        """search_params overrides the store's search settings for this call (used by the tuning sweep)."""
+        return self.client.search(
+            collection_name=self.collection_name,
+            query_vector=vector,
+            limit=limit,
+            score_threshold=score_threshold,
+            search_params=search_params or self.search_params,
+            with_payload=self.with_payload,
+            with_vectors=False,
+        )
+
+    def search_batch(self, vectors: List[List[float]], limit: int, score_threshold: Optional[float] = None) -> List[List[models.ScoredPoint]]:
+        # A single request for all the vectors
+        return self.client.search_batch(
+            collection_name=self.collection_name,
+            requests=self._batch_requests(vectors, limit, score_threshold)
+        )
+
+    def _batch_requests(self, vectors: List[List[float]], limit: int, score_threshold: Optional[float]) -> List[models.SearchRequest]:
+        return [
+            models.SearchRequest(vector=vector, limit=limit, score_threshold=score_threshold, with_payload=self.with_payload,
+                                 with_vector=False, params=self.search_params)
+            for vector in vectors
+        ]
+
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        # The async client is created on first use, so it belongs to the event loop that uses it
+        if self._shared["async_client"] is None:
+            self._shared["async_client"] = AsyncQdrantClient(url=self.url, prefer_grpc=True)
+        return self._shared["async_client"]
+
+    async def asearch_batch(self, vectors: List[List[float]], limit: int, score_threshold: Optional[float] = None) -> List[List[models.ScoredPoint]]:
+        if self.local:
+            # A second (async) local client would not see the same data
+            return await super().asearch_batch(vectors, limit, score_threshold)
+        return await self.async_client.search_batch(
+            collection_name=self.collection_name,
+            requests=self._batch_requests(vectors, limit, score_threshold)
+        )
+
+    async def asearch(self, vector: List[float], limit: int, score_threshold: Optional[float] = None) -> List[models.ScoredPoint]:
+        if self.local:
+            return await super().asearch(vector, limit, score_threshold)
+        return await self.async_client.search(
+            collection_name=self.collection_name,
+            query_vector=vector,
+            limit=limit,
+            score_threshold=score_threshold,
+            search_params=self.search_params,
+            with_payload=self.with_payload,
+            with_vectors=False,
+        )
+
+    def begin_ingest(self):
+        logger.info("Pausing indexing while ingesting...")
+        # indexing_threshold=0 turns indexing off, the HNSW index is built once in end_ingest()
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizer_config=models.OptimizersConfigDiff(indexing_threshold=0)
+        )
+
+    def end_ingest(self):
+        logger.info(f"Restoring indexing threshold ({self.indexing_threshold} KB), Qdrant now optimizes the collection...")
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizer_config=models.OptimizersConfigDiff(indexing_threshold=self.indexing_threshold)
+        )
+
+    def wait_for_index(self, timeout: float = 600, poll_interval: float = 0.5) -> bool:
+        """Waits until Qdrant finished optimizing (status green). Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            info = self.client.get_collection(self.collection_name)
+            if info.status == models.CollectionStatus.GREEN:
+                return True
+            time.sleep(poll_interval)
+        return False
+
+    def with_collection(self, collection_name: str) -> "QdrantVectorStore":
+        # Same sync and async clients, so all collections share one connection pool
+        store = copy.copy(self)
+        store.collection_name = collection_name
+        return store
+
+    def close(self):
+        self.client.close()
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    An in-process vector index: all vectors live in one contiguous NumPy matrix and a search is a
+    single matmul plus argpartition, so there is no network round trip.
+    Vectors can be kept as float32, float16 or int8 (each row scaled to [-127, 127]); scores are
+    always computed in float32. Same semantics as the Qdrant collection: DOT score, hits with
+    score >= score_threshold, best first, payload returned with the hit.
+    The index is saved under `path/collection_name/` and, with mmap=True, the matrix is memory-mapped
+    when loaded back, so a restart neither re-embeds nor reads everything into RAM up front.
+    """
+    BLOCK_ROWS = 65536  # float16/int8 rows are upcast block by block to bound the temporary memory
+
+    def __init__(self, path: str, collection_name: str, dtype: str = "float32", mmap: bool = True,
+                 payload_fields: Optional[List[str]] = None):
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unsupported dtype '{dtype}', use float32, float16 or int8.")
+        self.path = Path(path) / collection_name
+        self.collection_name = collection_name
+        self.dtype = np.dtype(dtype)
+        self.mmap = mmap
+        self.payload_fields = list(payload_fields) if payload_fields else None  # like QdrantVectorStore
+        self._lock = threading.RLock()
+        self.dim = None
+        self.size = 0  # rows in use, the matrix can have spare capacity
+        self.matrix = None
+        self.scales = None  # per row scale, only for int8
+        self.ids: List[Any] = []
+        self.payloads: List[Dict] = []
+        self.rows: Dict[Any, int] = {}
+        if (self.path / "meta.json").exists():
+            self._load()
+
+    def _load(self):
+        meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        if meta["dtype"] != self.dtype.name:
+            raise ValueError(f"Index at {self.path} is stored as {meta['dtype']}, not {self.dtype.name}.")
+        self.dim = meta["dim"]
+        self.size = meta["size"]
+        mmap_mode = "r" if self.mmap else None
+        self.matrix = np.load(self.path / "vectors.npy", mmap_mode=mmap_mode)
+        if self.dtype == np.int8:
+            self.scales = np.load(self.path / "scales.npy", mmap_mode=mmap_mode)
+        records = json.loads((self.path / "records.json").read_text(encoding="utf-8"))
+        self.ids = [record[0] for record in records]
+        self.payloads = [record[1] for record in records]
+        self.rows = {point_id: row for row, point_id in enumerate(self.ids)}
+
+    def save(self):
+        """Writes the index to disk."""
+        with self._lock:
+            if self.dim is None:
+                return
+            self.path.mkdir(parents=True, exist_ok=True)
+            # Every file is written next to the old one and swapped in: the old file may still be memory-mapped
+            self._replace("vectors.npy", lambda f: np.save(f, np.ascontiguousarray(self.matrix[:self.size])))
+            if self.dtype == np.int8:
+                self._replace("scales.npy", lambda f: np.save(f, np.ascontiguousarray(self.scales[:self.size])))
+            records = json.dumps([[i, p] for i, p in zip(self.ids, self.payloads)], ensure_ascii=False)
+            self._replace("records.json", lambda f: f.write(records.encode("utf-8")))
+            meta = json.dumps({"dim": self.dim, "dtype": self.dtype.name, "size": self.size})
+            self._replace("meta.json", lambda f: f.write(meta.encode("utf-8")))
+
+    def _replace(self, name: str, write):
+        tmp_path = self.path / (name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, self.path / name)
+
+    def exists(self) -> bool:
+        return self.dim is not None
+
+    def create(self, dim: int):
+        with self._lock:
+            self.dim = dim
+            self.size = 0
+            self.matrix = np.zeros((0, dim), dtype=self.dtype)
+            self.scales = np.zeros(0, dtype=np.float32) if self.dtype == np.int8 else None
+            self.ids, self.payloads, self.rows = [], [], {}
+            self.save()
+
+    def dimension(self) -> Optional[int]:
+        return self.dim
+
+    def drop(self):
+        with self._lock:
+            self.dim, self.size, self.matrix, self.scales = None, 0, None, None
+            self.ids, self.payloads, self.rows = [], [], {}
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def count(self) -> int:
+        return self.size
+
+    def _writable(self, needed: int):
+        # Grows by doubling, and turns a read-only memory map into an in-memory array on the first write
+        capacity = self.matrix.shape[0]
+        if needed <= capacity and isinstance(self.matrix, np.ndarray) and self.matrix.flags.writeable:
+            return
+        new_capacity = max(needed, capacity * 2 if needed > capacity else capacity, 1024)
+        matrix = np.zeros((new_capacity, self.dim), dtype=self.dtype)
+        matrix[:self.size] = self.matrix[:self.size]
+        self.matrix = matrix
+        if self.scales is not None:
+            scales = np.zeros(new_capacity, dtype=np.float32)
+            scales[:self.size] = self.scales[:self.size]
+            self.scales = scales
+
+    def _encode(self, vectors: np.ndarray):
+        if self.dtype == np.int8:
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(self.dtype), None
+
+    def upsert(self, points: List[models.PointStruct], wait: bool = True):
+        if not points:
+            return
+        vectors = np.asarray([point.vector for point in points], dtype=np.float32)
+        encoded, scales = self._encode(vectors)
+        with self._lock:
+            self._writable(self.size + len(points))
+            for i, point in enumerate(points):
+                row = self.rows.get(point.id)
+                if row is None:
+                    row = self.size
+                    self.size += 1
+                    self.rows[point.id] = row
+                    self.ids.append(point.id)
+                    self.payloads.append(point.payload or {})
+                else:
+                    self.payloads[row] = point.payload or {}
+                self.matrix[row] = encoded[i]
+                if scales is not None:
+                    self.scales[row] = scales[i]
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._writable(self.size)
+            for point_id in ids:
+                row = self.rows.pop(point_id, None)
+                if row is None:
+                    continue
+                # Move the last row into the hole so the matrix stays contiguous
+                last = self.size - 1
+                if row != last:
+                    self.matrix[row] = self.matrix[last]
+                    if self.scales is not None:
+                        self.scales[row] = self.scales[last]
+                    self.ids[row] = self.ids[last]
+                    self.payloads[row] = self.payloads[last]
+                    self.rows[self.ids[row]] = row
+                self.ids.pop()
+                self.payloads.pop()
+                self.size -= 1
+
+    def _scores(self, queries: np.ndarray, size: int) -> np.ndarray:
+        """Scores of the first `size` rows against queries of shape (dim, n). Returns (size, n)."""
+        if self.dtype == np.float32:
+            return self.matrix[:size] @ queries
+        scores = np.empty((size, queries.shape[1]), dtype=np.float32)
+        for start in range(0, size, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, size)
+            scores[start:end] = self.matrix[start:end].astype(np.float32) @ queries
+        if self.scales is not None:
+            scores *= self.scales[:size, None]
+        return scores
+
+    def search(self, vector: List[float], limit: int, score_threshold: Optional[float] = None) -> List[models.ScoredPoint]:
+        return self.search_batch([vector], limit, score_threshold)[0]
+
+    def search_batch(self, vectors: List[List[float]], limit: int, score_threshold: Optional[float] = None) -> List[List[models.ScoredPoint]]:
+        with self._lock:
+            size = self.size
+            if not size or limit <= 0:
+                return [[] for _ in vectors]
+            # One matmul for all the queries: (size x dim) @ (dim x queries)
+            all_scores = self._scores(np.asarray(vectors, dtype=np.float32).T, size)
+            return [self._top(all_scores[:, i], limit, score_threshold) for i in range(len(vectors))]
+
+    def _top(self, scores: np.ndarray, limit: int, score_threshold: Optional[float]) -> List[models.ScoredPoint]:
+        candidates = np.flatnonzero(scores >= score_threshold) if score_threshold is not None else np.arange(len(scores))
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [
+            models.ScoredPoint(id=self.ids[row], version=0, score=float(scores[row]), payload=self._project(self.payloads[row]))
+            for row in candidates
+        ]
+
+    def _project(self, payload: Dict) -> Dict:
+        if self.payload_fields is None:
+            return dict(payload)
+        return {field: payload[field] for field in self.payload_fields if field in payload}
+
+    def end_ingest(self):
+        self.save()
+
+    def with_collection(self, collection_name: str) -> "NumpyVectorStore":
+        return NumpyVectorStore(str(self.path.parent), collection_name, dtype=self.dtype.name, mmap=self.mmap,
+                                payload_fields=self.payload_fields)
+
+    def close(self):
+        self.save()
+
+
+def make_vector_store(backend: str, collection_name: str, qdrant_url: str = "http://localhost:6333",
+                      path: str = "./vector_store", dtype: str = "float32", mmap: bool = True,
+                      qdrant_options: Optional[Dict[str, Any]] = None,
+                      payload_fields: Optional[List[str]] = None) -> VectorStore:
+    """
+    Creates the vector store for a backend name ("qdrant" or "numpy").
+    qdrant_options are the collection/search settings of QdrantVectorStore (hnsw_m, quantization, hnsw_ef...).
+    payload_fields limits the payload returned with the hits.
+    """
+    if backend == "qdrant":
+        return QdrantVectorStore(qdrant_url, collection_name, payload_fields=payload_fields, **(qdrant_options or {}))
+    if backend == "numpy":
+        return NumpyVectorStore(path, collection_name, dtype=dtype, mmap=mmap, payload_fields=payload_fields)
+    raise ValueError(f"Unknown vector backend '{backend}', use 'qdrant' or 'numpy'.")
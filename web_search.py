@@ -0,0 +1,163 @@
+import json
+import threading
+from typing import Any, Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from caches import LRUCache, normalize_query
+
+DEFAULT_BASE_URL = "https://api.firecrawl.dev"
+
+
+class SearchError(Exception):
+    """The search API could not be reached or returned an error. The message is shown to the LLM."""
+
+
+class FirecrawlClient:
+    """
+    Firecrawl search over one pooled requests.Session, so the TLS connection is reused between calls.
+    - every request has a (connect, read) timeout, a stalled API can't hang a worker thread
+    - at most max_concurrency requests are in flight, callers above that wait for a slot
+      (or give up after connect_timeout)
+    - successful responses are cached for cache_ttl seconds by normalized query
+    base_url can point to a local stand-in server for testing.
+    """
+    def __init__(self,
+                 api_key: str,
+                 base_url: str = DEFAULT_BASE_URL,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 30.0,
+                 max_concurrency: int = 4,
+                 cache_size: int = 256,
+                 cache_ttl: float = 600.0):
+        self.api_key = api_key
+        self.search_url = base_url.rstrip("/") + "/v1/search"
+        self.timeout = (connect_timeout, read_timeout)
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+
+        self.session = requests.Session()
+        # One pooled connection per concurrent request is enough
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_concurrency))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+    @staticmethod
+    def cache_key(query: str) -> str:
+        return normalize_query(query).lower()
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """Returns the normalized results, raises SearchError on failure. Failures are not cached."""
+        key = self.cache_key(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Ask the API to finish before we stop reading
+        payload = {"query": query, "timeout": int(self.timeout[1] * 1000)}
+        if not self._slots.acquire(timeout=self.timeout[0]):
+            raise SearchError("Too many web searches in progress, please try again shortly.")
+        try:
+            response = self.session.post(self.search_url, json=payload, timeout=self.timeout)
+            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+            raw = response.json()
+        except requests.exceptions.RequestException as e:
+            raise SearchError(f"Error connecting to Firecrawl API: {e}") from e
+        except ValueError as e:
+            raise SearchError(f"Firecrawl API returned invalid JSON: {e}") from e
+        finally:
+            self._slots.release()
+
+        results = normalize_results(raw)
+        # If the API returned an error shape, report it
+        if len(results) == 1 and "error" in results[0]:
+            raise SearchError(f"Error from Firecrawl API: {results[0].get('error')}")
+        self.cache.put(key, results)
+        return results
+
+    def close(self):
+        self.session.close()
+
+
+def normalize_results(raw: Any) -> List[Dict[str, Any]]:
+    """Normalizes the different response shapes into List[dict]."""
+    # Prefer the 'data' key but fall back to other shapes.
+    if isinstance(raw, dict):
+        # common pattern: { "data": [...] }
+        data = raw.get("data", raw.get("results", None))
+    else:
+        data = raw
+
+    normalized: List[Dict[str, Any]] = []
+    if isinstance(data, dict):
+        normalized = [data]
+    elif isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict):
+                normalized.append(item)
+            else:
+                normalized.append({"result": item})
+    else:
+        normalized = [{"result": data}]
+    return normalized
+
+
+def _truncate(value: Any, limit: int) -> str:
+    text = " ".join(str(value).split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def format_results(query: str,
+                   results: List[Dict[str, Any]],
+                   compact: bool = True,
+                   max_results: int = 5,
+                   max_field_chars: int = 300,
+                   max_chars: int = 4000) -> str:
+    """
+    Builds the text for the LLM: a short summary of the top results (title/url/snippet).
+    compact=False also appends the full results as JSON (can be very large).
+    compact=True cuts every field to max_field_chars, adds a content excerpt when the API returned
+    page content, and caps the whole text at max_chars.
+    """
+    lines = [f"Found {len(results)} results for query: {query}"]
+
+    # Add brief top results (title/url/snippet) — try common keys
+    for idx, item in enumerate(results[:max_results], start=1):
+        title = item.get("title") or item.get("name") or item.get("headline") or item.get("result")
+        url_item = item.get("url") or item.get("link") or item.get("uri")
+        desc = item.get("description") or item.get("snippet") or item.get("summary") or ""
+        if compact:
+            title = _truncate(title, max_field_chars) if title else None
+            desc = _truncate(desc, max_field_chars) if desc else ""
+        brief = f"{idx}. {title or '(no title)'}"
+        if url_item:
+            brief += f" — {url_item}"
+        if desc:
+            brief += f"\n   {desc}"
+        content = item.get("markdown") or item.get("content")
+        if compact and content:
+            brief += f"\n   Excerpt: {_truncate(content, max_field_chars)}"
+        lines.append(brief)
+
+    if compact:
+        if len(results) > max_results:
+            lines.append(f"({len(results) - max_results} more results not shown)")
+        text = "\n".join(lines)
+        if len(text) > max_chars:
+            text = text[:max_chars - 20].rstrip() + "\n...(truncated)"
+        return text
+
+    # Add a separator and the full JSON results for downstream parsing if needed
+    try:
+        full_json = json.dumps(results, indent=2, ensure_ascii=False)
+    except Exception:
+        full_json = str(results)
+    lines.append("")
+    lines.append("Full results (JSON):")
+    lines.append(full_json)
+    return "\n".join(lines)